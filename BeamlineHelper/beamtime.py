@@ -7,9 +7,12 @@ Created on Wed Jun 14 10:35:33 2023
 """
 from matplotlib import cm
 import os
+import numpy as np
 
 from BeamlineHelper.config import Config
 from BeamlineHelper.datafile import DataFile
+from BeamlineHelper.motortable import MotorTable
+from BeamlineHelper.scancache import ScanCache
 
 class Beamtime:
     def __init__(
@@ -29,13 +32,57 @@ class Beamtime:
             "Shift",
             "Group",
         ],
+        workers=1,
+        cache_size=512 * 2**20,
+        dtype=np.float64,
+        backend="csv",
     ):
         self.datapath = datapath
         if list_of_collumns:
-            self.config = Config(datapath, list_of_collumns)
+            self.config = Config(datapath, list_of_collumns, workers=workers, backend=backend)
         else:
-            self.config = Config(datapath)
+            self.config = Config(datapath, workers=workers, backend=backend)
         self.files=set(line['Filename'] for line in self.config.timeline)
+        self.config.add_callback(self.config_changed)
+        self.datafiles = {}
+        self.dtype = dtype
+        self.cache = ScanCache(cache_size)
+
+    def config_changed(self, changed):
+        """
+        Updates the datafiles of the beamtime after the timeline.csv changed
+
+        Parameters
+        ----------
+        changed : list
+            names of the csv files which were read in again
+
+        Returns
+        -------
+        None
+            None
+        """
+        if "timeline.csv" in changed:
+            self.files = set(line["Filename"] for line in self.config.timeline)
+
+    def get_datafile(self, filename):
+        """
+        Returns the DataFile of the given filename and keeps it,
+        so the index of its scans only has to be build once
+
+        Parameters
+        ----------
+        filename : str
+            Name of the datafile
+
+        Returns
+        -------
+        DataFile
+            DataFile class of the given filename
+        """
+        if not filename in self.datafiles:
+            self.datafiles[filename] = DataFile(self.datapath, filename, dtype=self.dtype)
+        return self.datafiles[filename]
 
     def plot(
         self,
@@ -119,7 +166,12 @@ class Beamtime:
         return axis
 
     def read_data(
-        self, measurement=["All"], command=["All"], sampletype=["All"], sample=["All"]
+        self,
+        measurement=["All"],
+        command=["All"],
+        sampletype=["All"],
+        sample=["All"],
+        columns=None,
     ):
         """
         Reads in all datafiles included in the timeline.csv and exchanges their entries
@@ -139,30 +191,112 @@ class Beamtime:
         Sample : str, optional
             Sample to be read in (Default 'All')
 
+        columns : list or str, optional
+            Longnames of the only collumns to be read or 'axis' to read only
+            the collumns defined for the command in the axis.csv
+            (Default None, which reads all collumns)
+
         Returns
         -------
         list
             Ordered list of all the datasets listet in the timeline.csv file
         """
-        path = self.datapath + "/config"
-        if not os.path.exists(path + "/timeline.csv"):
-            raise Exception(
-                "No timeline.csv available.\n Use make_conf first and edit the timeline.csv file"
-            )
-        self.config.clean()
+        selection = self.config.select(
+            {
+                "Measurement": measurement,
+                "Command": command,
+                "Sample": sample,
+                "Sampletype": sampletype,
+            }
+        )
+        # read every file only once and sort the scans back into the timeline order
+        files = {}
+        projections = {}
+        for point in selection:
+            if not point["Filename"] in files:
+                files[point["Filename"]] = []
+                projections[point["Filename"]] = {}
+            files[point["Filename"]].append(point["#scan"])
+            if columns == "axis":
+                projection = self.config.get_axis_columns(point["Command"])
+            else:
+                projection = columns
+            projections[point["Filename"]][point["#scan"]] = projection
+        scans = {}
+        for file in files:
+            read = self.read_scans(file, files[file], projections[file])
+            for scannumber, scan in zip(files[file], read):
+                scans[(file, scannumber)] = scan
         all_data = []
-        for point in self.config.timeline:
-            if (
-                ('All' in measurement or point["Measurement"] in measurement)
-                and ('All' in command or point["Command"] in command) 
-                and ('All' in sample or point["Sample"] in sample)
-                and ('All' in sampletype or point["Sampletype"] in sampletype)
-            ):
-                current = DataFile(self.datapath, point["Filename"]).read(self.config)
-                data = current[int(point["#scan"]) - 1]
-                all_data.append(data)
+        for point in selection:
+            all_data.append(scans[(point["Filename"], point["#scan"])])
         return all_data
 
+    def read_scans(self, file, scannumbers, columns=None):
+        """Reads several scans of a datafile included in the timeline.csv
+        and exchanges their entries with the ones defined in the timeline.csv file.
+        Scans which were read recently are taken from the cache.
+
+        Parameters
+        ----------
+        file : str
+            Name of the file the scans are stored in
+
+        scannumbers : list
+            Numbers of the scans in the file
+
+        columns : list or dict, optional
+            longnames or positions of the only collumns to be read,
+            either for all scans or with the scannumbers as keys
+            (Default is None, which reads all collumns)
+
+        Returns
+        -------
+        list
+            Scan classes of the requested measurements in the requested order
+        """
+        if not isinstance(columns, dict):
+            columns = {scannumber: columns for scannumber in scannumbers}
+        mtime = os.stat(self.datapath + "/" + file).st_mtime_ns
+        scans = []
+        for scannumber in scannumbers:
+            scan = self.cache.get(file, scannumber, mtime)
+            # a cached projection might miss some of the requested collumns
+            if scan is not None and not scan.data.provides(columns.get(scannumber)):
+                scan = None
+            scans.append(scan)
+        missing = [
+            scannumber for scannumber, scan in zip(scannumbers, scans) if scan is None
+        ]
+        if missing:
+            read = iter(self.get_datafile(file).read_scans(missing, columns))
+            for i, scan in enumerate(scans):
+                if scan is None:
+                    scans[i] = next(read)
+                    self.cache.put(file, scannumbers[i], mtime, scans[i])
+        for scan in scans:
+            scan.update(self.config)
+        return scans
+
+    def read_scan(self, file, scannumber):
+        """Reads a single scan of a datafile included in the timeline.csv
+        and exchanges its entries with the ones defined in the timeline.csv file
+
+        Parameters
+        ----------
+        file : str
+            Name of the file the scan is stored in
+
+        scannumber : str
+            Number of the scan in the file
+
+        Returns
+        -------
+        Scan
+            Scan class of the requested measurement
+        """
+        return self.read_scans(file, [scannumber])[0]
+
     def read_file(self, file):
         """Reads a specific datafile included in the timeline.csv and exchanges
         their entries with the ones defined in the timeline.csv file of the current datapath
@@ -177,17 +311,41 @@ class Beamtime:
         list
             Ordered list of all the datasets from the specified file
         """
-        self.config.clean()
-        for point in self.config.timeline:
-            if file == point["Filename"]:
-                data = DataFile(self.datapath, point["Filename"]).read(self.config)
+        # only the scans of the timeline, newer ones can not be updated yet
+        scannumbers = list(
+            dict.fromkeys(
+                point["#scan"] for point in self.config.timeline if point["Filename"] == file
+            )
+        )
+        if scannumbers:
+            data = self.read_scans(file, scannumbers)
         return data
 
+    def get_motor_table(self):
+        """
+        Collects the initial motorpositions of all scans included in the
+        timeline.csv from their headers, without converting any data
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        MotorTable
+            initial motorpositions of all scans ordered by datafile
+        """
+        included = {
+            (point["Filename"], point["#scan"]) for point in self.config.timeline
+        }
+        scans = [
+            scan
+            for file in sorted(self.files)
+            for scan in self.get_datafile(file).read_headers()
+            if (scan.filename, scan.scannumber) in included
+        ]
+        return MotorTable(scans)
+
     def get_all_motors(self):
-        motors = []
-        all_data = self.read_data()
-        for scan in all_data:
-            for motor in scan.motor_position.keys():
-                if not motor in motors:
-                    motors.append(motor)
-        return motors
\ No newline at end of file
+        return list(self.get_motor_table().motors)
\ No newline at end of file
@@ -6,11 +6,17 @@ Created on Wed Jun 14 10:38:23 2023
 @author: kai
 """
 import os
+import io
+import csv
+import json
 import numpy as np
 import warnings
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 
 from BeamlineHelper.datafile import DataFile
-from BeamlineHelper.misc import Commands
+from BeamlineHelper.misc import Commands, get_compression
+from BeamlineHelper.store import TimelineStore
 
 class Config:
     """
@@ -22,32 +28,172 @@ class Config:
     ----------
         datapath
             absolute path to the file storing the measurement data
+
+        timeline_index
+            rows of the timeline with (Filename, #scan) as keys
+
+        workers
+            number of processes used to parse the datafiles,
+            1 parses them one after another and None uses all cores
+
+        stamps
+            size and mtime of the csv files when they were read last,
+            with the filenames as keys
+
+        callbacks
+            functions called with the list of changed csv files,
+            whenever reload() read in changed files
+
+        dirty
+            True if the timeline was changed in memory and not yet
+            written into the timeline.csv, see save()
+
+        store
+            TimelineStore mirroring the csv files for indexed queries,
+            None for the 'csv' backend
     """
 
-    def __init__(self, datapath, list_of_collumns):
+    def __init__(self, datapath, list_of_collumns, workers=1, backend="csv"):
         self.datapath = datapath
+        self.workers = workers
+        self.stamps = {}
+        self.callbacks = []
+        self.dirty = False
         self.make(list_of_collumns)
+        if backend == "sqlite":
+            self.store = TimelineStore(datapath + "/config/timeline.sqlite")
+        elif backend == "csv":
+            self.store = None
+        else:
+            raise Exception(f"Unknown backend {backend}, use 'csv' or 'sqlite'")
+        self.reload()
 
-        self.axis = self.axis_read()
-        self.edges = self.csv_read("edges.csv", 6)
-        self.timeline = self.csv_read("timeline.csv", 11)
+    def reload(self, force=False):
+        """
+        reload the csv files, which changed since they were read last
 
-    def reload(self):
+        Parameters
+        ----------
+        force : boolean, optional
+            If True, all csv files are read in again (Default is False)
+
+        Returns
+        -------
+        list
+            names of the csv files which were read in again
         """
-        reload the csv files
+        changed = []
+        for filename in ("axis.csv", "edges.csv", "timeline.csv"):
+            stat = os.stat(self.datapath + "/config/" + filename)
+            stamp = (stat.st_size, stat.st_mtime_ns)
+            if force or self.stamps.get(filename) != stamp:
+                self.stamps[filename] = stamp
+                changed.append(filename)
+        if "axis.csv" in changed:
+            self.axis = self.axis_read()
+        if "edges.csv" in changed:
+            self.edges = self.table_read("edges.csv", 6)
+        if "timeline.csv" in changed:
+            self.timeline = self.table_read("timeline.csv", 11)
+            self.index_timeline()
+        if changed:
+            for callback in self.callbacks:
+                callback(changed)
+        return changed
+
+    def table_read(self, filename, delimiter_position=None):
+        """
+        Reads a csv file of the config. With the 'sqlite' backend the rows are
+        taken from the store, if the csv file did not change since it was
+        loaded into the store, otherwise they are loaded into the store.
+
+        Parameters
         ----------
-        None
-            None
+        filename : str
+            name of the csv file in datapath/config
+        delimiter_position : int, optional
+            see csv_read() (Default is None)
+
+        Returns
+        -------
+        list
+            rows of the csv file in the format of csv_read()
+        """
+        if self.store is None:
+            return self.csv_read(filename, delimiter_position)
+        table = filename.replace(".csv", "")
+        if self.store.get_stamp(table) == self.stamps[filename]:
+            return self.store.rows(table)
+        rows = self.csv_read(filename, delimiter_position)
+        self.store.load(table, rows, self.stamps[filename])
+        return rows
+
+    def select(self, filters={}):
+        """
+        Selects the rows of the timeline matching the filters.
+        A list of allowed values containing 'All' does not restrict the collumn.
+
+        Parameters
+        ----------
+        filters : dict, optional
+            allowed values of the collumns with the collumns as keys,
+            e.g. {"Measurement": ["XanesL3"], "Sampletype": ["Sa"]} (Default is {})
+
+        Returns
+        -------
+        list
+            matching rows of the timeline in the order of the timeline.csv
+        """
+        filters = {
+            key: [allowed] if isinstance(allowed, str) else allowed
+            for key, allowed in filters.items()
+        }
+        filters = {
+            key: allowed for key, allowed in filters.items() if not "All" in allowed
+        }
+        if self.store is not None:
+            return [self.timeline[position] for position in self.store.select("timeline", filters)]
+        return [
+            data
+            for data in self.timeline
+            if all(data.get(key) in allowed for key, allowed in filters.items())
+        ]
+
+    def add_callback(self, callback):
+        """
+        Registers a function, which is called with the list of changed
+        csv files, whenever reload() read in changed files
+
+        Parameters
+        ----------
+        callback : function
+            function taking the list of changed csv files
 
         Returns
         -------
         None
             None
         """
+        self.callbacks.append(callback)
 
-        self.axis = self.axis_read()
-        self.edges = self.csv_read("edges.csv", 6)
-        self.timeline = self.csv_read("timeline.csv", 11)
+    def index_timeline(self):
+        """
+        Builds a lookup of the timeline rows with (Filename, #scan) as keys
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        dict
+            timeline rows with (Filename, #scan) as keys
+        """
+        self.timeline_index = {}
+        for data in self.timeline:
+            key = (data["Filename"], data["#scan"])
+            if not key in self.timeline_index:
+                self.timeline_index[key] = data
+        return self.timeline_index
 
     def make(self, list_of_collumns=[
             "Measurement",
@@ -86,20 +232,25 @@ class Config:
         if not os.path.exists(self.datapath + "/config"):
             os.mkdir(self.datapath + "/config")
 
-        if not os.path.exists(self.datapath + "/config/timeline.csv") or force:
-            self.make_timeline(list_of_collumns=list_of_collumns, ignore=ignore)
-        if not os.path.exists(self.datapath + "/config/axis.csv") or force:
-            self.make_axis(ignore=ignore)
+        make_timeline = not os.path.exists(self.datapath + "/config/timeline.csv") or force
+        make_axis = not os.path.exists(self.datapath + "/config/axis.csv") or force
+        if make_timeline or make_axis:
+            # one pass over the datafiles feeds all the generated files
+            scans = self.read_all_headers(ignore=ignore)
+        if make_timeline:
+            self.make_timeline(list_of_collumns=list_of_collumns, ignore=ignore, scans=scans)
+        if make_axis:
+            self.make_axis(ignore=ignore, scans=scans)
         if not os.path.exists(self.datapath + "/config/edges.csv") or force:
             self.make_edge()
         else:
-            self.clean()
             print("Config already exists. To overwrite it, use the argument force=True in config.make()")
 
     def clean(self):
         """
-        Cleans the timeline.csv of the current datapath by removing anything
-        written between the lines
+        Cleans the timeline.csv of the current datapath by converting it
+        to ';' as delimiter and replacing empty lines with empty rows.
+        The file is only written if this changes it.
 
         Parameters
         ----------
@@ -108,42 +259,36 @@ class Config:
 
         Returns
         -------
-        None
-            None
+        boolean
+            True if the timeline.csv was written
         """
-        lines = []
-        first = True
-        path = self.datapath + "/config"
-        if not os.path.exists(path + "/timeline.csv"):
+        path = self.datapath + "/config/timeline.csv"
+        if not os.path.exists(path):
             raise Exception(
                 "No timeline.csv available.\n Use make_conf first and edit the timeline.csv file"
             )
-        with open(path + "/timeline.csv", encoding="UTF-8") as datafile:
-            for line in datafile:
-                content = line.replace(",", " ")
-                content = content.replace(";", " ")
-                content = content.strip()
-                if first:
-                    first = False
-                    length = len(line.split())
-                if len(content.split()) < length:
-                    lines.append(length * ";" + "\n")
-                else:
-                    newline = line.replace(",", ";")
-                    lines.append(newline)
-        with open(path + "timeline.csv", "w", encoding="UTF-8") as datafile:
-            for line in lines:
-                datafile.write(line)
+        text, lines, newline = self.read_lines(path)
+        delimiter, names = self.read_header(lines[0] if lines else "")
+        out = []
+        for data in csv.reader(lines, delimiter=delimiter):
+            if any(point.strip() for point in data):
+                out.append(self.format_row(data))
+            else:
+                out.append(";" * (len(names) - 1))
+        return self.write_lines(path, text, out, newline)
 
-    def make_axis(self, ignore):
+    def make_axis(self, ignore, scans=None):
         """
         Creates an axis.csv file containing the information about
         which commands correspond to which axis to plot
 
         Parameters
         ----------
-        None
-            None
+        ignore : list
+            List containing all the substrings of the datafiles you want
+            to completely ignore, e.g. 'align' or 'test'
+        scans : list, optional
+            Already read ScanHeaders of the datapath, if None they are read in
 
         Returns
         -------
@@ -151,26 +296,71 @@ class Config:
             None
         """
         path = self.datapath + "/config"
-        data = self.read_all_raw(ignore=ignore)
+        if scans is None:
+            scans = self.read_all_headers(ignore=ignore)
         commands = []
 
         out = [["Command", "x1", "x2", "y", "ymon"]]
-        for scan in data:
-            command = Commands(scan.command)
-            if not command.minimize() in commands:
-                commands.append(command.minimize())
-                out.append([command.minimize(), "", "", "", ""])
-                motorlist = command.get_motors(scan.longnames)
-                for i, motor in enumerate(motorlist):
-                    out[-1][i + 1] = motor
-                if "APD" in scan.longnames:
-                    out[-1][3] = "APD"
-                elif "Detector" in scan.longnames:
-                    out[-1][3] = "Detector"
-                if "Ioni1" in scan.longnames:
-                    out[-1][4] = "Ioni1"
+        for scan in scans:
+            command = Commands(scan.command).minimize()
+            if not command in commands:
+                commands.append(command)
+                out.append(self.make_axis_row(scan))
         np.savetxt(path + "/axis.csv", out, delimiter=";", fmt="%s")
 
+    def make_axis_row(self, scan):
+        """
+        Guesses the axis to plot the command of a scan
+
+        Parameters
+        ----------
+        scan : ScanHeader
+            Scan with the command
+
+        Returns
+        -------
+        list
+            minimized command, x1, x2, y and ymon
+        """
+        command = Commands(scan.command)
+        row = [command.minimize(), "", "", "", ""]
+        motorlist = command.get_motors(scan.longnames)
+        for i, motor in enumerate(motorlist):
+            row[i + 1] = motor
+        if "APD" in scan.longnames:
+            row[3] = "APD"
+        elif "Detector" in scan.longnames:
+            row[3] = "Detector"
+        if "Ioni1" in scan.longnames:
+            row[4] = "Ioni1"
+        return row
+
+    def add_axis(self, scans):
+        """
+        Appends the commands of the scans missing in the axis.csv
+
+        Parameters
+        ----------
+        scans : list
+            ScanHeaders of the new scans
+
+        Returns
+        -------
+        None
+            None
+        """
+        commands = set(self.axis)
+        rows = []
+        for scan in scans:
+            command = Commands(scan.command).minimize()
+            if not command in commands:
+                commands.add(command)
+                rows.append(self.make_axis_row(scan))
+        if rows:
+            with open(self.datapath + "/config/axis.csv", "a", encoding="UTF-8") as datafile:
+                for row in rows:
+                    datafile.write(";".join(row) + "\n")
+
     def make_edge(self):
         """
         Creates an edges.csv file containing the information about
@@ -191,15 +381,23 @@ class Config:
         out = [["Sample", "Edge", "Energy"], ["LaOx", "xasLaL2", "5.89060"]]
         np.savetxt(path + "/edges.csv", out, delimiter=";", fmt="%s")
 
-    def make_timeline(self, list_of_collumns, ignore, readable=True):
+    def make_timeline(self, list_of_collumns, ignore, readable=True, scans=None):
         """
         Creates an timeline.csv file containing the information
         about the measurements
 
         Parameters
         ----------
-        None
-            None
+        list_of_collumns : list
+            Collumns of the timeline.csv
+        ignore : list
+            List containing all the substrings of the datafiles you want
+            to completely ignore, e.g. 'align' or 'test'
+        readable : boolean, optional
+            True if you want to have spaces between different files for better
+            readability (Default is True)
+        scans : list, optional
+            Already read ScanHeaders of the datapath, if None they are read in
 
         Returns
         -------
@@ -207,8 +405,10 @@ class Config:
             None
         """
         print("Making timeline.csv")
-        all_data = self.read_all_raw(ignore=ignore)
-        all_data.sort(key=lambda item: item.date)
+        stamps = self.get_stamps(ignore)
+        if scans is None:
+            scans = self.read_all_headers(ignore=ignore)
+        all_data = sorted(scans, key=lambda item: item.date)
         out = []
         out.append(list_of_collumns)
         empty = []
@@ -227,46 +427,302 @@ class Config:
             if last_measurement not in (scan.measurement, ""):
                 group_list[last_measurement] += 1
 
-            alias = {
-                "Measurement": scan.measurement,
-                "Date": scan.date.strftime("%d-%m-%Y"),
-                "Time": scan.date.strftime("%H:%M:%S"),
-                "Filename": scan.filename,
-                "#scan": scan.scannumber,
-                "Command": scan.command,
-                "Sampletype": scan.sampletype,
-                "Sample": scan.sample,
-                "Mask": scan.mask,
-                "Slits": scan.slits,
-                "Data_Points": str(len(scan.data[scan.longnames[0]])),
-                "Shift": "0",
-                "Group": group_list[scan.measurement],
-            }
-            row = []
-            for name in list_of_collumns:
-                if name == "slits":
-                    if "slit_small1" in scan.motor_position.keys():
-                        if (
-                            float(scan.motor_position["slit_small1"]) < 1
-                            or float(scan.motor_position["slit_small2"]) < 1
-                        ):
-                            slits = "no"
-                        else:
-                            slits = "yes"
-                    else:
-                        slits = "?"
-                        warnings.warn("Warning:" + scan.filename + ":No Slit data")
-                    row.append(slits)
-                elif name in alias.keys():
-                    row.append(alias[name])
-                elif name in scan.motor_position.keys():
-                    row.append(scan.motor_position[name])
-                else:
-                    row.append("")
-            out.append(row)
+            out.append(self.make_row(scan, list_of_collumns, group_list[scan.measurement]))
             last_measurement = scan.measurement
             last_file = scan.filename
         np.savetxt(self.datapath + "/config/timeline.csv", out, delimiter=";", fmt="%s")
+        for file in stamps:
+            stamps[file].append([])
+        for scan in scans:
+            if scan.filename in stamps and not scan.scannumber in stamps[scan.filename][2]:
+                stamps[scan.filename][2].append(scan.scannumber)
+        self.write_stamps(stamps)
+
+    def make_row(self, scan, list_of_collumns, group):
+        """
+        Generates the row of a scan in the timeline.csv
+
+        Parameters
+        ----------
+        scan : ScanHeader
+            Scan of the row
+        list_of_collumns : list
+            Collumns of the timeline.csv
+        group : int
+            Group of the scan
+
+        Returns
+        -------
+        list
+            entries of the row in the order of the collumns
+        """
+        alias = {
+            "Measurement": scan.measurement,
+            "Date": scan.date.strftime("%d-%m-%Y"),
+            "Time": scan.date.strftime("%H:%M:%S"),
+            "Filename": scan.filename,
+            "#scan": scan.scannumber,
+            "Command": scan.command,
+            "Sampletype": scan.sampletype,
+            "Sample": scan.sample,
+            "Mask": scan.mask,
+            "Slits": scan.slits,
+            "Data_Points": str(scan.points),
+            "Shift": "0",
+            "Group": group,
+        }
+        row = []
+        for name in list_of_collumns:
+            if name == "slits":
+                if "slit_small1" in scan.motors:
+                    if (
+                        scan.get_motor("slit_small1") < 1
+                        or scan.get_motor("slit_small2") < 1
+                    ):
+                        slits = "no"
+                    else:
+                        slits = "yes"
+                else:
+                    slits = "?"
+                    warnings.warn("Warning:" + scan.filename + ":No Slit data")
+                row.append(slits)
+            elif name in alias.keys():
+                row.append(alias[name])
+            elif name in scan.motors:
+                position = scan.get_motor(name)
+                if np.isnan(position):
+                    row.append("")
+                else:
+                    row.append(np.format_float_positional(position, trim="-"))
+            else:
+                row.append("")
+        return row
+
+    def update_timeline(self, ignore=[], readable=True):
+        """
+        Adds the scans of new or changed datafiles to the timeline.csv without
+        touching its existing rows. Only the changed datafiles are read in and
+        their new scans are inserted in date order, scans which were added
+        before are not added again, even if their rows were deleted. A new scan continues the
+        group of the scan before it, if both belong to the same measurement,
+        otherwise it starts the next group of its measurement.
+        Commands missing in the axis.csv are added as well.
+
+        Parameters
+        ----------
+        ignore : list, optional
+            List containing all the substrings of the datafiles you want
+            to completely ignore, e.g. 'align' or 'test' (Default is [])
+        readable : boolean, optional
+            True if you want to have spaces between different files for better
+            readability (Default is True)
+
+        Returns
+        -------
+        int
+            number of the added scans
+        """
+        stamps = self.get_stamps(ignore)
+        recorded = self.read_stamps()
+        changed = [file for file in stamps if recorded.get(file, [])[:2] != stamps[file]]
+        if not changed:
+            return 0
+        self.reload()
+        scans = []
+        for file in stamps:
+            if not file in changed:
+                stamps[file] = recorded[file]
+                continue
+            headers = DataFile(self.datapath, file).read_headers()
+            known = self.get_known_scans(file, recorded.get(file), headers)
+            scans += [
+                scan
+                for scan in headers
+                if not scan.scannumber in known
+                and not (scan.filename, scan.scannumber) in self.timeline_index
+            ]
+            stamps[file].append(list(dict.fromkeys(scan.scannumber for scan in headers)))
+        scans.sort(key=lambda item: item.date)
+        if scans:
+            self.insert_rows(scans, readable)
+            self.add_axis(scans)
+        self.write_stamps(stamps)
+        self.reload()
+        return len(scans)
+
+    def get_known_scans(self, file, record, scans):
+        """
+        Lists the scans of a datafile, which were already added to the timeline.csv
+
+        Parameters
+        ----------
+        file : str
+            name of the datafile
+        record : list
+            recorded [size, mtime, scannumbers] of the datafile or None
+        scans : list
+            ScanHeaders of the datafile
+
+        Returns
+        -------
+        set
+            numbers of the scans added before
+        """
+        if record is not None and len(record) > 2:
+            return set(record[2])
+        # Not recorded, e.g. for a timeline.csv made by an older version:
+        # a datafile not modified since the timeline.csv was written is
+        # completely known, otherwise all scans up to its last scan in the timeline.
+        if (
+            os.stat(self.datapath + "/" + file).st_mtime_ns
+            <= os.stat(self.datapath + "/config/timeline.csv").st_mtime_ns
+        ):
+            return {scan.scannumber for scan in scans}
+        numbers = [
+            int(scannumber)
+            for filename, scannumber in self.timeline_index
+            if filename == file and scannumber.isdigit()
+        ]
+        if not numbers:
+            return set()
+        return {
+            scan.scannumber
+            for scan in scans
+            if scan.scannumber.isdigit() and int(scan.scannumber) <= max(numbers)
+        }
+
+    def insert_rows(self, scans, readable=True):
+        """
+        Inserts the rows of new scans into the timeline.csv in date order,
+        the existing lines are kept as they are
+
+        Parameters
+        ----------
+        scans : list
+            ScanHeaders of the new scans sorted by date
+        readable : boolean, optional
+            True if you want to have spaces between different files for better
+            readability (Default is True)
+
+        Returns
+        -------
+        None
+            None
+        """
+        path = self.datapath + "/config/timeline.csv"
+        text, lines, newline = self.read_lines(path)
+        delimiter, names = self.read_header(lines[0])
+        # line, date, measurement, group and filename of the existing rows
+        rows = []
+        for position, data in enumerate(csv.reader(lines[1:], delimiter=delimiter), 1):
+            if len(data) != len(names) or not any(data):
+                continue
+            row = dict(zip(names, data))
+            try:
+                date = datetime.strptime(row["Date"] + " " + row["Time"], "%d-%m-%Y %H:%M:%S")
+            except (KeyError, ValueError):
+                # rows without a date can not be ordered
+                continue
+            rows.append(
+                [position, date, row.get("Measurement"), row.get("Group", ""), row.get("Filename")]
+            )
+        empty = delimiter * (len(names) - 1)
+        for scan in scans:
+            # behind the last row, which is not later than the scan
+            k = len(rows)
+            while k and rows[k - 1][1] > scan.date:
+                k -= 1
+            previous = rows[k - 1] if k else None
+            if previous is not None and previous[2] == scan.measurement:
+                group = previous[3]
+            else:
+                groups = [
+                    int(row[3])
+                    for row in rows[:k]
+                    if row[2] == scan.measurement and row[3].isdigit()
+                ]
+                group = max(groups) + 1 if groups else 1
+            new = []
+            if readable and previous is not None and previous[4] != scan.filename:
+                new.append(empty)
+                if previous[2] != scan.measurement:
+                    new.append(empty)
+            new.append(self.format_row(self.make_row(scan, names, group), delimiter))
+            if previous is not None:
+                position = previous[0] + 1
+            elif rows:
+                position = rows[0][0]
+            else:
+                position = len(lines)
+            lines[position:position] = new
+            for row in rows[k:]:
+                row[0] += len(new)
+            rows.insert(
+                k,
+                [position + len(new) - 1, scan.date, scan.measurement, str(group), scan.filename],
+            )
+        self.write_lines(path, text, lines, newline)
+
+    def get_stamps(self, ignore=[]):
+        """
+        Returns size and mtime of all datafiles in the datapath
+
+        Parameters
+        ----------
+        ignore : list, optional
+            List containing all the substrings of the datafiles you want
+            to completely ignore, e.g. 'align' or 'test' (Default is [])
+
+        Returns
+        -------
+        dict
+            [size, mtime] with the names of the datafiles as keys
+        """
+        stamps = {}
+        for file in self.get_datafiles(ignore):
+            stat = os.stat(self.datapath + "/" + file)
+            stamps[file] = [stat.st_size, stat.st_mtime_ns]
+        return stamps
+
+    def read_stamps(self):
+        """
+        Reads size and mtime of the datafiles, when they were added to the timeline.csv,
+        and the numbers of their scans added to it
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        dict
+            [size, mtime, scannumbers] with the names of the datafiles as keys,
+            empty if they were never recorded
+        """
+        try:
+            with open(self.datapath + "/config/datafiles.json", encoding="UTF-8") as stampfile:
+                return json.load(stampfile)
+        except (OSError, ValueError):
+            return {}
+
+    def write_stamps(self, stamps):
+        """
+        Records size and mtime of the datafiles added to the timeline.csv
+        and the numbers of their scans added to it
+
+        Parameters
+        ----------
+        stamps : dict
+            [size, mtime, scannumbers] with the names of the datafiles as keys
+
+        Returns
+        -------
+        None
+            None
+        """
+        with open(self.datapath + "/config/datafiles.json", "w", encoding="UTF-8") as stampfile:
+            json.dump(stamps, stampfile)
 
     def read_all_raw(self, ignore=["Nothing"]):
         """
@@ -281,118 +737,394 @@ class Config:
         list
             A list containing all the dictionaries for each datafile
         """
+        return self.read_all("read_raw", ignore)
+
+    def read_all_headers(self, ignore=["Nothing"]):
+        """
+        Reads in the headers of all datafiles from the datapath
+        without converting their data
+        Parameters
+        ----------
+        ignore : list
+            List containing all the substrings of the datafiles you want
+            to completely ignore, e.g. 'align' or 'test'.
+        Returns
+        -------
+        list
+            A list containing the ScanHeader of every scan
+        """
+        return self.read_all("read_headers", ignore)
+
+    def read_all(self, method, ignore=["Nothing"]):
+        """
+        Calls a reading method of DataFile for all datafiles from the datapath,
+        in parallel if more than one worker is set
+        Parameters
+        ----------
+        method : str
+            Name of the DataFile method, e.g. 'read_raw' or 'read_headers'
+        ignore : list
+            List containing all the substrings of the datafiles you want
+            to completely ignore, e.g. 'align' or 'test'.
+        Returns
+        -------
+        list
+            A list containing the scans of all datafiles
+        """
+        files = self.get_datafiles(ignore)
         all_data = []
-        for root, directories, files in os.walk(self.datapath):
+        if self.workers == 1:
             for file in files:
-                if (
-                    root == self.datapath
-                    and not ("." in file)
-                    and not any([name in file for name in ignore])
-                ):
-                    data = DataFile(self.datapath, file).read_raw()
-                    if data:
-                        for point in data:
-                            all_data.append(point)
+                data = getattr(DataFile(self.datapath, file), method)()
+                if data:
+                    for point in data:
+                        all_data.append(point)
+            return all_data
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(getattr(DataFile(self.datapath, file), method))
+                for file in files
+            ]
+            # collect the results in the order of the files
+            for file, future in zip(files, futures):
+                try:
+                    data = future.result()
+                except Exception as error:
+                    warnings.warn("File " + file + " could not be read: " + str(error))
+                    continue
+                if data:
+                    for point in data:
+                        all_data.append(point)
         return all_data
 
-    def write(self, conf_data):
+    def get_datafiles(self, ignore=["Nothing"]):
         """
-        Uses the input config-data to overwrite the current timeline.csv file
-        of the current datapath  with the new data
+        Lists all datafiles in the datapath in alphabetical order,
+        including datafiles compressed as .gz, .xz or .bz2
         Parameters
         ----------
         ignore : list
-            List containing the config-data in the format of read_conf()
+            List containing all the substrings of the datafiles you want
+            to completely ignore, e.g. 'align' or 'test'.
+        Returns
+        -------
+        list
+            A list containing the names of the datafiles
+        """
+        files = []
+        for file in sorted(os.listdir(self.datapath)):
+            if (
+                os.path.isfile(self.datapath + "/" + file)
+                and not ("." in file[: len(file) - len(get_compression(file))])
+                and not any([name in file for name in ignore])
+            ):
+                files.append(file)
+        return files
+
+    def write(self, conf_data):
+        """
+        Uses the input config-data as the new timeline and writes it
+        into the timeline.csv file of the current datapath
+
+        Parameters
+        ----------
+        conf_data : list
+            List containing the config-data in the format of csv_read()
+
         Returns
         -------
         None
             None
         """
-        i = 0
-        first = True
-        lines = []
-        path = self.datapath + "/config"
-        with open(self.datapath + "/config/timeline.csv", encoding="UTF-8") as datafile:
-            for line in datafile:
-                content = line.replace('"', "").strip()
-                if first:
-                    content = line.replace(" ", "")
-                    delimiter = content[11]
-                    # cover for empty fields
-                for i in range(0, 10):
-                    content = content.replace(
-                        2 * delimiter, delimiter + "None" + delimiter
-                    )
-
-                # set up the split
-                content = content.replace(delimiter, " ")
-                content = content.strip()
-                if first:
-                    first = False
-                    header = content.split()
-                    length = len(header)
-                    newline = line.replace(",", ";")
-                    lines.append(newline)
-                elif len(content.split()) < length:
-                    lines.append(length * ";" + "\n")
-                else:
-                    newline = ""
-                    for name in header:
-                        newline = newline + conf_data[i][name] + ";"
-                    newline += "\n"
-                    lines.append(newline)
-                    i += 1
-        with open(path + "timeline.csv", "w", encoding="UTF-8") as datafile:
-            for line in lines:
-                datafile.write(line)
+        self.timeline = conf_data
+        self.index_timeline()
+        self.dirty = True
+        self.save()
 
-    def csv_read(self, filename, delimiter_position):
+    def save(self):
         """
-        Reads in the timeline.csv file and structures it into a list
+        Writes the timeline into the timeline.csv file of the current datapath,
+        if it was changed since it was read. The empty rows of the file are
+        kept and rows without changes are not reformatted. An Exception is
+        raised if the timeline.csv itself was changed since it was read.
 
         Parameters
         ----------
-        ignore : list
-            List containing the config-data in the format of read_conf()
+        None
+            None
+
+        Returns
+        -------
+        boolean
+            True if the timeline.csv was written
+        """
+        if not self.dirty:
+            return False
+        path = self.datapath + "/config/timeline.csv"
+        stat = os.stat(path)
+        if self.stamps.get("timeline.csv") != (stat.st_size, stat.st_mtime_ns):
+            # the rows in memory would overwrite the edits in the file
+            raise Exception(
+                "timeline.csv changed since it was read.\n"
+                "Use reload() and apply the changes again"
+            )
+        text, lines, newline = self.read_lines(path)
+        delimiter, names = self.read_header(lines[0])
+        rows = iter(self.timeline)
+        out = lines[:1]
+        for line, data in zip(lines[1:], csv.reader(lines[1:], delimiter=delimiter)):
+            if not self.is_row(data, len(names)):
+                out.append(line)
+                continue
+            row = next(rows, None)
+            if row is None:
+                # the row was removed from the timeline
+                continue
+            if row == self.make_entry(names, data):
+                out.append(line)
+            else:
+                out.append(self.format_row([row.get(name, "") for name in names], delimiter))
+        # rows added to the timeline
+        for row in rows:
+            out.append(self.format_row([row.get(name, "") for name in names], delimiter))
+        written = self.write_lines(path, text, out, newline)
+        self.dirty = False
+        if written:
+            stat = os.stat(path)
+            self.stamps["timeline.csv"] = (stat.st_size, stat.st_mtime_ns)
+            if self.store is not None:
+                self.store.load("timeline", self.timeline, self.stamps["timeline.csv"])
+            for callback in self.callbacks:
+                callback(["timeline.csv"])
+        return written
+
+    def read_lines(self, path):
+        """
+        Reads the lines of a csv file, which is rewritten afterwards
+        with write_lines()
+
+        Parameters
+        ----------
+        path : str
+            path of the csv file
+
+        Returns
+        -------
+        tuple
+            content of the file, its lines without byte order mark and
+            line breaks and the line break used in the file
+        """
+        with open(path, encoding="UTF-8", newline="") as datafile:
+            text = datafile.read()
+        end = text.find("\n")
+        newline = "\r\n" if end > 0 and text[end - 1] == "\r" else "\n"
+        return text, text.lstrip("\ufeff").splitlines(), newline
+
+    def write_lines(self, path, text, lines, newline):
+        """
+        Writes the lines of a csv file read with read_lines() atomically,
+        keeping its byte order mark and line breaks
+
+        Parameters
+        ----------
+        path : str
+            path of the csv file
+        text : str
+            content of the file returned by read_lines()
+        lines : list
+            lines of the file without line breaks
+        newline : str
+            line break used in the file
+
+        Returns
+        -------
+        boolean
+            True if the file was written, False if the content did not change
+        """
+        bom = "\ufeff" if text.startswith("\ufeff") else ""
+        return self.write_atomic(path, text, bom + newline.join(lines) + newline)
+
+    def read_header(self, line, delimiter_position=None):
+        """
+        Reads the delimiter and the collumns of a csv file from its first line
+
+        Parameters
+        ----------
+        line : str
+            first line of the csv file without byte order mark
+        delimiter_position : int, optional
+            see sniff() (Default is None)
+
+        Returns
+        -------
+        tuple
+            delimiter and collumns of the csv file
+        """
+        delimiter = self.sniff(line, delimiter_position)
+        names = [
+            name.replace(" ", "")
+            for name in next(csv.reader([line], delimiter=delimiter), [])
+        ]
+        return delimiter, names
+
+    def write_atomic(self, path, old, new):
+        """
+        Replaces a file by writing the new content into a temporary file
+        and swapping it in, so readers never see a partially written file
+
+        Parameters
+        ----------
+        path : str
+            path of the file
+        old : str
+            current content of the file
+        new : str
+            new content of the file
+
+        Returns
+        -------
+        boolean
+            True if the file was written, False if the content did not change
+        """
+        if new == old:
+            return False
+        with open(path + ".tmp", "w", encoding="UTF-8", newline="") as datafile:
+            datafile.write(new)
+        os.replace(path + ".tmp", path)
+        return True
+
+    def format_row(self, data, delimiter=";"):
+        """
+        Formats the entries of a row of a csv file
+
+        Parameters
+        ----------
+        data : list
+            entries of the row
+        delimiter : str, optional
+            delimiter of the csv file (Default is ';')
+
+        Returns
+        -------
+        str
+            line of the row without line break
+        """
+        line = io.StringIO()
+        csv.writer(line, delimiter=delimiter, lineterminator="").writerow(data)
+        return line.getvalue()
+
+    def sniff(self, line, delimiter_position=None):
+        """
+        Guesses the delimiter of a csv file from its first line
+
+        Parameters
+        ----------
+        line : str
+            first line of the csv file
+        delimiter_position : int, optional
+            Position of the delimiter in the first line, which is only used
+            if the delimiter can not be sniffed (Default is None, which uses ';')
+
+        Returns
+        -------
+        str
+            delimiter of the csv file
+        """
+        try:
+            return csv.Sniffer().sniff(line, delimiters=";,\t").delimiter
+        except csv.Error:
+            if delimiter_position is None:
+                return ";"
+            return line.replace(" ", "")[delimiter_position]
+
+    def is_row(self, data, width):
+        """
+        Checks if the entries of a line form a row of a csv file
+
+        Parameters
+        ----------
+        data : list
+            entries of the line
+        width : int
+            number of collumns of the csv file
+
+        Returns
+        -------
+        boolean
+            False for empty rows and rows with a wrong number of entries
+        """
+        return len(data) == width and sum(point in ("", "None") for point in data) < width
+
+    def make_entry(self, names, data):
+        """
+        Generates the dictionary of a row of a csv file,
+        empty entries are returned as 'None'
+
+        Parameters
+        ----------
+        names : list
+            collumns of the csv file
+        data : list
+            entries of the row
+
+        Returns
+        -------
+        dict
+            entries of the row with the collumns as keys
+        """
+        if "" in data:
+            data = [point if point else "None" for point in data]
+        return dict(zip(names, data))
+
+    def csv_read(self, filename, delimiter_position=None):
+        """
+        Reads in a csv file of the config folder and structures it into a list
+
+        Parameters
+        ----------
+        filename : str
+            Name of the csv file in the config folder, e.g. 'timeline.csv'
+
+        delimiter_position : int, optional
+            Position of the delimiter in the first line, which is only used
+            if the delimiter can not be sniffed (Default is None)
 
         Returns
         -------
         list
             A list containing a dictionary with elements for each collumn
         """
-        out = []
-        first = True
-        with open(self.datapath + "/config/" + filename, encoding="UTF-8") as datafile:
-            for line in datafile:
-                content = line.replace('"', "").strip()
-                if first:
-                    content = content.replace(" ", "")
-                    delimiter = content[delimiter_position]
-
-                content = content.replace(" ", "[space]").strip()
-                # cover for empty fields
-                for i in range(0, 10):
-                    content = content.replace(
-                        2 * delimiter, delimiter + "None" + delimiter
-                    )
-                if content[-1] == delimiter:
-                    content += "None"
-                content = content.replace(delimiter, " ")
-                content = content.strip()
-
-                if first:
-                    names = content.split()
-                    first = False
-                elif content.replace("None", "") != "":
-                    data = content.split()
-                    current = {}
-                    if len(names) == len(data):
-                        for i, name in enumerate(names):
-                            point = data[i].strip()
-                            point = point.replace("[space]", " ")
-                            current[name] = point
-                        out.append(current)
-        return out
+        return list(self.csv_rows(filename, delimiter_position))
+
+    def csv_rows(self, filename, delimiter_position=None):
+        """
+        Reads a csv file of the config folder in a single pass and yields its rows.
+        The delimiter (';', ',' or tab) is sniffed from the first line, empty
+        fields are returned as 'None', empty rows and rows with a wrong number
+        of fields are skipped.
+
+        Parameters
+        ----------
+        filename : str
+            Name of the csv file in the config folder, e.g. 'timeline.csv'
+
+        delimiter_position : int, optional
+            Position of the delimiter in the first line, which is only used
+            if the delimiter can not be sniffed (Default is None)
+
+        Returns
+        -------
+        generator
+            A dictionary with elements for each collumn for every row
+        """
+        with open(
+            self.datapath + "/config/" + filename, encoding="utf-8-sig", newline=""
+        ) as datafile:
+            delimiter, names = self.read_header(datafile.readline(), delimiter_position)
+            width = len(names)
+            for data in csv.reader(datafile, delimiter=delimiter):
+                if self.is_row(data, width):
+                    yield self.make_entry(names, data)
 
     def edit_axis(self, commands):
         """
@@ -422,7 +1154,7 @@ class Config:
 
     def axis_read(self):
         axis = {}
-        data = self.csv_read("axis.csv", 7)
+        data = self.table_read("axis.csv", 7)
         for point in data:
             axis[point["Command"]] = {}
             for key in point.keys():
@@ -430,9 +1162,59 @@ class Config:
                     axis[point["Command"]][key] = point[key]
         return axis
 
+    def get_axis_columns(self, command):
+        """
+        Lists the collumns needed to plot a scan of the given command
+        as defined in the axis.csv
+
+        Parameters
+        ----------
+        command : str
+            command used to create the scan
+
+        Returns
+        -------
+        list
+            longnames of the collumns and the positions of the collumns
+            Scan.plot falls back to, or None if the command is not in the axis.csv
+        """
+        command = Commands(command).minimize()
+        if not command in self.axis:
+            return None
+        columns = []
+        for name in self.axis[command].values():
+            if not name in ("None", ""):
+                columns.append(name)
+        if self.axis[command].get("x1", "None") in ("None", ""):
+            columns.append(1)
+        if self.axis[command].get("y", "None") in ("None", ""):
+            columns.append(2)
+        return columns
+
     def get_list(self, keys, restrictions=False):
+        """
+        Lists the different values of collumns of the timeline
+
+        Parameters
+        ----------
+        keys : list
+            collumns of the timeline
+        restrictions : list, optional
+            values a row has to contain in any of its collumns
+            to be listed (Default is False)
+
+        Returns
+        -------
+        dict
+            values of the collumns in the order they first appear
+            in the timeline with the collumns as keys
+        """
         out = {}
         self.reload()
+        if self.store is not None:
+            for key in keys:
+                out[key] = self.store.distinct("timeline", key, restrictions=restrictions or [])
+            return out
         for key in keys:
             out[key] = []
         for data in self.timeline:
@@ -460,9 +1242,8 @@ class Config:
         None
             None
         """
-        self.clean()
+        self.reload()
         measurement_group_list = {}
-        new_conf_data = []
         for data in self.timeline:
             measurement_group = data["Measurement"] + "_" + data["Group"]
             if not measurement_group in measurement_group_list.keys():
@@ -479,8 +1260,7 @@ class Config:
             if shifts:
                 shift_total = np.sum(shifts) / len(shifts)
             for data in group:
-                if data["Sampletype"] == "Sa":
+                if data["Sampletype"] == "Sa" and data["Shift"] != str(shift_total):
                     data["Shift"] = str(shift_total)
-                new_conf_data.append(data)
-        self.timeline = new_conf_data
-        self.write(self.timeline)
+                    self.dirty = True
+        self.save()
@@ -5,9 +5,16 @@ Created on Wed Jun 14 10:41:10 2023
 
 @author: kai
 """
+import os
+import re
+import mmap
 import warnings
+import contextlib
+import numpy as np
 
-from BeamlineHelper.scan import Scan
+from BeamlineHelper.misc import Commands, get_compression, open_datafile
+from BeamlineHelper.scan import Scan, ScanHeader, split_mca
+from BeamlineHelper.sidecar import Sidecar
 
 class DataFile:
     """
@@ -19,34 +26,388 @@ class DataFile:
             absolute path to the file storing the measurement data
         filename
             name of the file
+
+        index, dict
+            byte offsets (start, end) of every #S block in the file
+            with the scannumbers as keys
+
+        fileheader, dict
+            processed main header of the file
+
+        sidecar, Sidecar
+            binary cache of the parsed file in datapath/config/cache
+            or None if the cache is disabled
+
+        dtype, numpy.dtype
+            data type of the converted data, e.g. numpy.float32
+            to halve the memory of the scans
+
+        diagnostics, list
+            scans which could not be read by the last read_raw() as
+            dictionaries with file, scan, offset and reason
     """
 
-    def __init__(self, datapath, filename):
+    def __init__(self, datapath, filename, cache=True, dtype=np.float64):
         self.datapath = datapath
         self.filename = filename
+        self.dtype = np.dtype(dtype)
+        self.index = {}
+        self.fileheader = {}
+        self.index_stamp = None
+        self.diagnostics = []
+        self.sidecar = Sidecar(datapath, filename, self.dtype) if cache else None
+        # state of the follow mode, see poll()
+        self.follow_offset = 0
+        self.follow_fileheader = []
+        self.follow_block = None
+
+    def build_index(self):
+        """
+        Runs once through the datafile and stores the byte offsets of every
+        #S block together with the main header of the file. Plain datafiles
+        are memory-mapped and searched for the #S lines, compressed ones
+        are read line by line.
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        dict
+            byte offsets (start, end) of every #S block in the file
+            with the scannumbers as keys
+        """
+        path = self.datapath + "/" + self.filename
+        stamp = os.stat(path)
+        if get_compression(path):
+            index, fileheader = self.scan_lines(path)
+        else:
+            with open(path, "rb") as datafile, self.map(datafile) as buffer:
+                index, fileheader = self.scan_buffer(buffer)
+        self.index = index
+        self.fileheader = self.process_header(fileheader)
+        self.index_stamp = (stamp.st_size, stamp.st_mtime_ns)
+        return self.index
 
-    def seperate_datafile(self):
-        measurement_number = -1
+    def scan_lines(self, path):
+        """
+        Finds the #S blocks of a compressed datafile line by line
+
+        Parameters
+        ----------
+        path : str
+            path of the datafile
+
+        Returns
+        -------
+        tuple
+            index of the #S blocks and the lines of the main header
+        """
+        index = {}
         fileheader = []
-        datsets = []
-        with open(
-            self.datapath + "/" + self.filename, "r", encoding="UTF-8"
-        ) as datafile:
-            # Reading
+        offset = 0
+        current = None
+        with open_datafile(path, "rb") as datafile:
             for line in datafile:
+                content = line.strip()
+                if content[:2] == b"#S":
+                    if current is not None:
+                        index[current][1] = offset
+                    current = self.get_key(content, offset, index)
+                    index[current] = [offset, None]
+                elif current is None and content[:1] == b"#":
+                    fileheader.append(content.decode("UTF-8", errors="replace"))
+                offset += len(line)
+        if current is not None:
+            index[current][1] = offset
+        return index, fileheader
+
+    def scan_buffer(self, buffer):
+        """
+        Finds the #S blocks of a memory-mapped datafile with byte searches,
+        so the data lines are never split into single lines
+
+        Parameters
+        ----------
+        buffer : mmap.mmap or bytes
+            content of the datafile
+
+        Returns
+        -------
+        tuple
+            index of the #S blocks and the lines of the main header
+        """
+        starts = [0] if buffer[:2] == b"#S" else []
+        position = buffer.find(b"\n#S")
+        while position >= 0:
+            starts.append(position + 1)
+            position = buffer.find(b"\n#S", position + 1)
+        index = {}
+        for start, end in zip(starts, starts[1:] + [len(buffer)]):
+            stop = buffer.find(b"\n", start, end)
+            line = buffer[start : end if stop < 0 else stop]
+            index[self.get_key(line, start, index)] = [start, end]
+        fileheader = [
+            line.strip()
+            for line in buffer[: starts[0] if starts else len(buffer)]
+            .decode("UTF-8", errors="replace")
+            .splitlines()
+            if line.strip()[:1] == "#"
+        ]
+        return index, fileheader
+
+    def get_key(self, line, offset, index):
+        """
+        Returns the key of a #S block in the index
+
+        Parameters
+        ----------
+        line : bytes
+            #S line of the block
+
+        offset : int
+            byte offset of the block
+
+        index : dict
+            blocks found so far
+
+        Returns
+        -------
+        str
+            scannumber of the block or '#' and its offset, if the
+            scannumber is missing or was already used by an earlier block
+        """
+        content = line.decode("UTF-8", errors="replace").split()
+        # keep the first block, if a scannumber is used twice
+        if len(content) < 2 or content[1] in index:
+            return "#" + str(offset)
+        return content[1]
+
+    def map(self, datafile):
+        """
+        Maps an opened plain datafile into memory
+
+        Parameters
+        ----------
+        datafile : file object
+            datafile opened in binary mode
+
+        Returns
+        -------
+        mmap.mmap or contextlib.nullcontext
+            read only map of the datafile, empty files can not be
+            mapped and result in empty bytes
+        """
+        if os.fstat(datafile.fileno()).st_size == 0:
+            return contextlib.nullcontext(b"")
+        return mmap.mmap(datafile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get_index(self):
+        """
+        Returns the index of the #S blocks and rebuilds it,
+        if the datafile changed since it was build
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        dict
+            byte offsets (start, end) of every #S block in the file
+            with the scannumbers as keys
+        """
+        stamp = os.stat(self.datapath + "/" + self.filename)
+        if self.index_stamp != (stamp.st_size, stamp.st_mtime_ns):
+            self.build_index()
+        return self.index
+
+    def read_scan(self, scannumber, columns=None):
+        """
+        Reads in a single scan of the datafile by seeking directly
+        to its #S block
+
+        Parameters
+        ----------
+        scannumber : str
+            Number of the scan in the file as written in the #S line
+
+        columns : list, optional
+            longnames or positions of the only collumns to be read
+            (Default is None, which reads all collumns)
+
+        Returns
+        -------
+        Scan
+            Scan class of the requested measurement
+        """
+        return self.read_scans([scannumber], columns)[0]
+
+    def read_scans(self, scannumbers, columns=None):
+        """
+        Reads in several scans of the datafile while opening it only once
+        and seeking directly to their #S blocks
+
+        Parameters
+        ----------
+        scannumbers : list
+            Numbers of the scans in the file as written in the #S lines
+
+        columns : list or dict, optional
+            longnames or positions of the only collumns to be read,
+            either for all scans or with the scannumbers as keys
+            (Default is None, which reads all collumns)
+
+        Returns
+        -------
+        list
+            Scan classes of the requested measurements in the requested order
+        """
+        scannumbers = [str(scannumber) for scannumber in scannumbers]
+        if not isinstance(columns, dict):
+            columns = {scannumber: columns for scannumber in scannumbers}
+        if self.sidecar is not None:
+            cached = self.sidecar.load_scans(scannumbers)
+            if cached is not None:
+                fileheader, scans = cached
+                return [
+                    Scan(
+                        self.filename,
+                        fileheader,
+                        header,
+                        points,
+                        columns.get(scannumber),
+                        self.dtype,
+                        mca,
+                    )
+                    for scannumber, (header, points, mca) in zip(scannumbers, scans)
+                ]
+        index = self.get_index()
+        for scannumber in scannumbers:
+            if not scannumber in index:
+                raise KeyError(
+                    f"Scan {scannumber} is not included in {self.filename}"
+                )
+        with self.open_blocks() as read:
+            return [
+                self.read_block(read(*index[scannumber]), columns.get(scannumber))
+                for scannumber in scannumbers
+            ]
+
+    @contextlib.contextmanager
+    def open_blocks(self):
+        """
+        Opens the datafile for random access to its #S blocks. Plain datafiles
+        are memory-mapped, so reading a block only touches its pages.
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        context manager
+            function returning the bytes of the datafile between two offsets
+        """
+        path = self.datapath + "/" + self.filename
+        if get_compression(path):
+            with open_datafile(path, "rb") as datafile:
+
+                def read(start, end):
+                    datafile.seek(start)
+                    return datafile.read(end - start)
+
+                yield read
+        else:
+            with open(path, "rb") as datafile, self.map(datafile) as buffer:
+                yield lambda start, end: buffer[start:end]
+
+    def read_block(self, block, columns=None):
+        """
+        Generates a scan class from the text of a single #S block
+
+        Parameters
+        ----------
+        block : str or bytes
+            text of the #S block
+
+        columns : list, optional
+            longnames or positions of the only collumns to be read
+            (Default is None, which reads all collumns)
+
+        Returns
+        -------
+        Scan
+            Scan class of the measurement
+        """
+        header, data = self.split_block(block)
+        return Scan(
+            self.filename,
+            self.fileheader,
+            self.process_header(header),
+            data,
+            columns,
+            self.dtype,
+        )
+
+    def split_block(self, block):
+        """
+        Seperates the header lines of a #S block from its data lines.
+        The data lines of an undecoded block stay a single bytes object
+        and are handed to the numeric parser as they are. Blocks with
+        comments or MCA spectra between the data lines are split line by line.
+
+        Parameters
+        ----------
+        block : str or bytes
+            text of the #S block
+
+        Returns
+        -------
+        tuple
+            header lines and data lines (list or bytes) of the block
+        """
+        if isinstance(block, str):
+            header = []
+            data = []
+            for line in block.splitlines():
                 line = line.strip()
                 if line:
                     if line[0] == "#":
-                        if line[1] == "S":
-                            datsets.append({"header": [], "data": []})
-                            measurement_number += 1
-                        if measurement_number == -1:
-                            fileheader.append(line)
-                        else:
-                            datsets[measurement_number]["header"].append(line)
+                        header.append(line)
                     else:
-                        datsets[measurement_number]["data"].append(line)
-        return fileheader, datsets
+                        data.append(line)
+            return header, data
+        header = []
+        position = 0
+        while position < len(block):
+            end = block.find(b"\n", position)
+            end = len(block) if end < 0 else end
+            line = block[position:end].strip()
+            if line and line[:1] != b"#":
+                break
+            if line:
+                header.append(line.decode("UTF-8", errors="replace"))
+            position = end + 1
+        data = block[position:].rstrip()
+        # comments after the data, e.g. of an aborted scan
+        comments = []
+        while data:
+            start = data.rfind(b"\n") + 1
+            if data[start:].lstrip()[:1] != b"#":
+                break
+            comments.insert(0, data[start:].strip().decode("UTF-8", errors="replace"))
+            data = data[:start].rstrip()
+        # comments, MCA spectra or empty lines between the data lines
+        if b"#" in data or b"@" in data or self.empty_line.search(data):
+            return self.split_block(block.decode("UTF-8", errors="replace"))
+        return header + comments, data
+
+    empty_line = re.compile(rb"\n[ \t\r]*\n")
 
     def process_header(self, header):
         fileheader = {}
@@ -56,14 +417,156 @@ class DataFile:
             fileheader[key] = data
         return fileheader
 
-    def read_raw(self):
+    def iter_blocks(self, scannumbers=None, commands=None):
         """
-        Reads in the datafile to generate usable scan classes
+        Runs once through the datafile and yields the #S blocks one by one,
+        so only a single block is kept in memory at a time. Blocks which do
+        not match the filters are skipped without storing their data lines.
+        Plain datafiles are memory-mapped and their blocks are found with
+        the index, compressed ones are read line by line.
 
         Parameters
         ----------
-        None
-            None
+        scannumbers : list, optional
+            Numbers of the only scans to be yielded
+            (Default is None, which yields all scans)
+
+        commands : list, optional
+            Commands of the only scans to be yielded, either the full command,
+            its minimized form or only the name of the spec macro e.g. 'ascan'
+            (Default is None, which yields all scans)
+
+        Returns
+        -------
+        generator
+            byte offset, processed fileheader, processed header
+            and data lines of every block
+        """
+        if scannumbers is not None:
+            scannumbers = {str(scannumber) for scannumber in scannumbers}
+        if commands is not None:
+            commands = set(commands)
+        if not get_compression(self.filename):
+            # plain datafiles are memory-mapped and read block by block
+            index = self.get_index()
+            with self.open_blocks() as read:
+                for start, end in index.values():
+                    block = read(start, end)
+                    stop = block.find(b"\n")
+                    line = block[: len(block) if stop < 0 else stop].decode("UTF-8", errors="replace")
+                    if self.match(line, scannumbers, commands):
+                        header, data = self.split_block(block)
+                        yield start, self.fileheader, self.process_header(header), data
+            return
+        fileheader = None
+        fileheader_raw = []
+        header = None
+        data = []
+        offset = 0
+        with open_datafile(self.datapath + "/" + self.filename, "rb") as datafile:
+            for line in datafile:
+                position = offset
+                offset += len(line)
+                line = line.decode("UTF-8", errors="replace").strip()
+                if not line:
+                    continue
+                if line[:2] == "#S":
+                    if header is not None:
+                        yield start, fileheader, self.process_header(header), data
+                    if fileheader is None:
+                        fileheader = self.process_header(fileheader_raw)
+                    data = []
+                    start = position
+                    header = [line] if self.match(line, scannumbers, commands) else None
+                elif fileheader is None:
+                    if line[0] == "#":
+                        fileheader_raw.append(line)
+                elif header is not None:
+                    if line[0] == "#":
+                        header.append(line)
+                    else:
+                        data.append(line)
+        if header is not None:
+            yield start, fileheader, self.process_header(header), data
+
+    def match(self, line, scannumbers=None, commands=None):
+        """
+        Checks if the #S line of a block matches the filters of iter_blocks()
+
+        Parameters
+        ----------
+        line : str
+            #S line of the block
+
+        scannumbers : set, optional
+            Numbers of the only scans to be matched
+
+        commands : set, optional
+            Commands of the only scans to be matched
+
+        Returns
+        -------
+        boolean
+            True if the block matches all filters
+        """
+        content = line.split()
+        if scannumbers is not None:
+            if len(content) < 2 or content[1] not in scannumbers:
+                return False
+        if commands is not None:
+            command = " ".join(content[2:])
+            if not (
+                command in commands
+                or len(content) > 2 and content[2] in commands
+                or Commands(command).minimize() in commands
+            ):
+                return False
+        return True
+
+    def iter_scans(self, scannumbers=None, commands=None, columns=None):
+        """
+        Generates the scans of the datafile one by one while reading it,
+        see iter_blocks() for the filters
+
+        Parameters
+        ----------
+        scannumbers : list, optional
+            Numbers of the only scans to be yielded
+            (Default is None, which yields all scans)
+
+        commands : list, optional
+            Commands of the only scans to be yielded
+            (Default is None, which yields all scans)
+
+        columns : list, optional
+            longnames or positions of the only collumns to be read
+            (Default is None, which reads all collumns)
+
+        Returns
+        -------
+        generator
+            Scan class of every matching measurement
+        """
+        for offset, fileheader, header, data in self.iter_blocks(scannumbers, commands):
+            yield Scan(self.filename, fileheader, header, data, columns, self.dtype)
+
+    def read_raw(self, columns=None, salvage=False):
+        """
+        Reads in the datafile to generate usable scan classes. Scans which can
+        not be read are skipped and reported in the diagnostics, so a single
+        malformed scan does not hide the other scans of the file.
+
+        Parameters
+        ----------
+        columns : list, optional
+            longnames or positions of the only collumns to be read,
+            all other collumns are skipped while reading
+            (Default is None, which reads all collumns)
+
+        salvage : boolean, optional
+            If True, scans with unreadable data lines, e.g. partially written
+            ones, are returned with the data points before the first unreadable
+            line and marked as truncated (Default is False)
 
         Returns
         -------
@@ -72,23 +575,202 @@ class DataFile:
             containing all the relevant informations of the measurement
         """
         measurements = []
-        # Seperate the file into headers and measurement data
+        self.diagnostics = []
+        try:
+            # Use the binary cache if the file did not change since it was written
+            cached = self.sidecar.load() if self.sidecar is not None else None
+            if cached is not None and not (salvage and self.sidecar.meta["diagnostics"]):
+                self.diagnostics = list(self.sidecar.meta["diagnostics"])
+                fileheader, scans = cached
+                for header, points, mca in scans:
+                    measurements.append(
+                        Scan(
+                            self.filename,
+                            fileheader,
+                            header,
+                            points,
+                            columns,
+                            self.dtype,
+                            mca,
+                        )
+                    )
+                for i in self.sidecar.meta["truncated"]:
+                    measurements[i].data.truncated = True
+                return measurements
+            if self.sidecar is not None:
+                key = self.sidecar.get_key()
+            headers = []
+            fileheader = {}
+            # only complete scans are cached
+            cache = self.sidecar is not None and columns is None and not salvage
+            for offset, fileheader, header, data in self.iter_blocks():
+                scan = None
+                try:
+                    scan = Scan(self.filename, fileheader, header, data, columns, self.dtype)
+                    # converts the data lines, so unreadable scans are diagnosed
+                    # with and without the cache
+                    scan.data.get_array()
+                except Exception as error:
+                    if not (salvage and self.salvage(scan)):
+                        self.diagnose(header.get("#S", ""), offset, error)
+                        continue
+                headers.append(header)
+                measurements.append(scan)
+            if self.diagnostics:
+                warnings.warn(
+                    f"File {self.filename}: {len(self.diagnostics)} scans could not be read, "
+                    "see DataFile.diagnostics"
+                )
+            if cache:
+                self.sidecar.save(
+                    fileheader,
+                    [
+                        (header, scan.data.get_array(), scan.mca)
+                        for header, scan in zip(headers, measurements)
+                    ],
+                    key,
+                    self.diagnostics,
+                    [i for i, scan in enumerate(measurements) if scan.truncated],
+                )
+            return measurements
+        except Exception as error:
+            self.diagnose(None, None, error)
+            warnings.warn(
+                "File " + self.filename + " does not contain data or is corrupt"
+            )
+            return measurements
+
+    def salvage(self, scan):
+        """
+        Keeps the data points of a scan before its first unreadable line
+
+        Parameters
+        ----------
+        scan : Scan
+            Scan with unreadable data lines or None
+
+        Returns
+        -------
+        boolean
+            True if at least one data point could be salvaged
+        """
+        if scan is None:
+            return False
         try:
-            fileheader_raw, datsets_raw = self.seperate_datafile()
-            # Restructure the fileheader into a dictionary
-            fileheader = self.process_header(fileheader_raw)
-            # For each dataset structure the important informations into dictionarys
-            for data in datsets_raw:
+            scan.points = scan.data.salvage()
+        except Exception:
+            return False
+        return scan.points > 0
+
+    def diagnose(self, scannumber, offset, error):
+        """
+        Records why a scan of the datafile could not be read
+
+        Parameters
+        ----------
+        scannumber : str
+            content of the #S line of the scan or None for the whole file
+
+        offset : int
+            byte offset of the #S block or None for the whole file
+            or if it is not known
+
+        error : Exception
+            error raised while reading the scan
+
+        Returns
+        -------
+        None
+            None
+        """
+        if scannumber:
+            scannumber = scannumber.split()[0]
+        self.diagnostics.append(
+            {
+                "file": self.filename,
+                "scan": scannumber or None,
+                "offset": offset,
+                "reason": f"{type(error).__name__}: {error}",
+            }
+        )
+
+    def read_headers(self):
+        """
+        Reads in only the headers of the datafile. The data lines are
+        counted but not converted, which is sufficient to generate the
+        timeline.csv and axis.csv. Scans whose header can not be read are
+        skipped and reported in the diagnostics like in read_raw()
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        list
+            A list with a ScanHeader for each measurement in the file
+        """
+        measurements = []
+        self.diagnostics = []
+        try:
+            cached = self.sidecar.load_headers() if self.sidecar is not None else None
+            if cached is not None:
+                self.diagnostics = list(self.sidecar.meta["diagnostics"])
+                fileheader, scans = cached
+                for header, points in scans:
+                    measurements.append(
+                        ScanHeader(self.filename, fileheader, header, points)
+                    )
+                return measurements
+            fileheader = []
+            datsets = []
+            continued = False
+            with open_datafile(self.datapath + "/" + self.filename) as datafile:
+                for line in datafile:
+                    line = line.strip()
+                    if line:
+                        if continued or line[0] == "@":
+                            # MCA spectra are not counted as data points
+                            continued = line[-1] == "\\"
+                        elif line[0] == "#":
+                            if line[1] == "S":
+                                datsets.append(
+                                    {"header": [], "points": 0, "first": "", "last": ""}
+                                )
+                            if not datsets:
+                                fileheader.append(line)
+                            else:
+                                datsets[-1]["header"].append(line)
+                        elif datsets:
+                            if not datsets[-1]["points"]:
+                                datsets[-1]["first"] = line
+                            datsets[-1]["points"] += 1
+                            datsets[-1]["last"] = line
+            fileheader = self.process_header(fileheader)
+            for data in datsets:
+                # a truncated last line is dropped when the data is read
+                if len(data["last"].split()) < len(data["first"].split()):
+                    data["points"] -= 1
                 header = self.process_header(data["header"])
-                measurements.append(
-                    Scan(self.filename, fileheader, header, data["data"])
+                try:
+                    measurements.append(
+                        ScanHeader(self.filename, fileheader, header, data["points"])
+                    )
+                except Exception as error:
+                    self.diagnose(header.get("#S", ""), None, error)
+            if self.diagnostics:
+                warnings.warn(
+                    f"File {self.filename}: {len(self.diagnostics)} scans could not be read, "
+                    "see DataFile.diagnostics"
                 )
             return measurements
-        except:
+        except Exception as error:
+            self.diagnose(None, None, error)
             warnings.warn(
                 "File " + self.filename + " does not contain data or is corrupt"
             )
-            return []
+            return measurements
 
     def read(self, config):
         """
@@ -110,4 +792,141 @@ class DataFile:
         measurement = self.read_raw()
         for scan in measurement:
             scan.update(config)
-        return measurement
\ No newline at end of file
+        return measurement
+
+    def poll(self):
+        """
+        Follow mode for datafiles which are still being written by spec.
+        Every call only parses the bytes appended since the last call,
+        the first call parses the whole file. A trailing line without a
+        line break is held back until it is complete.
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        list
+            Scan classes of the measurements which are new or
+            got new data points since the last call
+        """
+        path = self.datapath + "/" + self.filename
+        # archived files do not grow, their size is not comparable to the offset
+        if not get_compression(path) and os.path.getsize(path) < self.follow_offset:
+            # the file was replaced, start again from the beginning
+            self.follow_offset = 0
+            self.follow_fileheader = []
+            self.follow_block = None
+        with open_datafile(path, "rb") as datafile:
+            datafile.seek(self.follow_offset)
+            appended = datafile.read()
+        end = appended.rfind(b"\n") + 1
+        # an MCA spectrum is held back until its last line is written
+        if appended[:end].rstrip().endswith(b"\\"):
+            end = appended.rfind(b"\n@", 0, end) + 1
+        self.follow_offset += end
+        changed = []
+        data = []
+        for line in appended[:end].decode("UTF-8", errors="replace").splitlines():
+            line = line.strip()
+            if line:
+                if line[0] == "#":
+                    if line[1] == "S":
+                        self.add_points(data)
+                        data = []
+                        self.follow_block = {"header": [], "points": None, "mca": {}}
+                        changed.append(self.follow_block)
+                    if self.follow_block is None:
+                        self.follow_fileheader.append(line)
+                        continue
+                    self.follow_block["header"].append(line)
+                else:
+                    data.append(line)
+                # e.g. the #L line written after the #S line was already read
+                if self.follow_block is not None and (
+                    not changed or changed[-1] is not self.follow_block
+                ):
+                    changed.append(self.follow_block)
+        self.add_points(data)
+        fileheader = self.process_header(self.follow_fileheader)
+        measurements = []
+        for block in changed:
+            header = self.process_header(block["header"])
+            # the scan is returned as soon as its collumns are known
+            if "#L" in header:
+                if block["points"] is None:
+                    points = np.empty((0, len(header["#L"].split())), dtype=self.dtype)
+                else:
+                    points = block["points"][0][: block["points"][1]]
+                measurements.append(
+                    Scan(
+                        self.filename,
+                        fileheader,
+                        header,
+                        points,
+                        dtype=self.dtype,
+                        mca={
+                            name: spectra[:count]
+                            for name, (spectra, count) in block["mca"].items()
+                        },
+                    )
+                )
+        return measurements
+
+    def add_points(self, data):
+        """
+        Appends new data lines and MCA spectra to the scan currently followed by poll()
+
+        Parameters
+        ----------
+        data : list
+            new data lines of the scan
+
+        Returns
+        -------
+        None
+            None
+        """
+        data, spectra = split_mca(data)
+        for name, texts in spectra.items():
+            self.follow_block["mca"][name] = self.append_rows(
+                self.follow_block["mca"].get(name),
+                np.loadtxt(texts, dtype=self.dtype, ndmin=2),
+            )
+        if not data:
+            return
+        self.follow_block["points"] = self.append_rows(
+            self.follow_block["points"], np.loadtxt(data, dtype=self.dtype, ndmin=2)
+        )
+
+    def append_rows(self, stored, rows):
+        """
+        Appends rows to an array, which is allocated with spare rows, so
+        every call only copies the new rows and the earlier returned views
+        of the filled rows stay valid
+
+        Parameters
+        ----------
+        stored : list
+            array and number of its filled rows or None
+        rows : numpy.ndarray
+            new rows
+
+        Returns
+        -------
+        list
+            array and number of its filled rows
+        """
+        if stored is None:
+            return [rows, len(rows)]
+        array, count = stored
+        if count + len(rows) > len(array):
+            grown = np.empty(
+                (max(2 * len(array), count + len(rows)),) + array.shape[1:], dtype=array.dtype
+            )
+            grown[:count] = array[:count]
+            array = grown
+        array[count : count + len(rows)] = rows
+        return [array, count + len(rows)]
@@ -239,8 +239,8 @@ class Analyzer(QWidget):
         self.estimated_s2n_plot.update()
     
     def update(self,scan):
-        if scan:
-            self.signal_to_noise.datapoints=len(list(scan.data.values())[0])
+        if scan is not None:
+            self.signal_to_noise.datapoints=scan.points
             self.status.setText(scan.filename+":"+str(scan.scannumber)+" selected. Select the background.")
             self.canvas.scan = scan
             self.canvas.points=[]
@@ -74,6 +74,7 @@ class BeamtimeViewer(QWidget):
         
         self.editor=Editor(datapath=datapath,beamtime=self.beamtime)
         self.editor.reload.connect(self.reload_timeline)
+        self.beamtime.config.add_callback(self.config_changed)
         
         tabs = QTabWidget()
         tabs.setTabPosition(QTabWidget.North)
@@ -92,9 +93,13 @@ class BeamtimeViewer(QWidget):
         self.setLayout(main_layout)
     
     def reload_timeline(self):
+        # the viewer is only updated by config_changed, if the timeline.csv really changed
         self.beamtime.config.reload()
-        self.timeline.loadData(self.beamtime)
-        self.timeline.scan_list_updated.connect(self.update)
+    
+    def config_changed(self,changed):
+        if "timeline.csv" in changed:
+            self.timeline.loadData(self.beamtime)
+            self.timeline.scan_list_updated.connect(self.update)
     
     def update(self,current_scan,scan_dict):
         self.main_plot.update_plot(current_scan,scan_dict)
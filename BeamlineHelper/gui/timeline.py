@@ -53,8 +53,7 @@ class TimelineViewer(QWidget):
     def update(self, row, checked):
         if self.row_to_scan[row]!=-1:
             config=self.beamtime.config.timeline[self.row_to_scan[row]]
-            scan=self.beamtime.read_file(config['Filename'])[int(config["#scan"])-1]
-            scan.update(self.beamtime.config)
+            scan=self.beamtime.read_scan(config['Filename'],config["#scan"])
             if checked:
                 #set current scan and update plot setter
                 self.scan_plot_list[config['Filename']+'_'+config["#scan"]]=scan
@@ -5,6 +5,56 @@ Created on Wed Nov 14 15:22:42 2021
 
 @author: kai
 """
+import os
+import gzip
+import lzma
+import bz2
+
+# codecs of archived datafiles with their suffixes
+COMPRESSIONS = {".gz": gzip.open, ".xz": lzma.open, ".bz2": bz2.open}
+
+
+def get_compression(filename):
+    """
+    Returns the suffix of a compressed datafile
+
+    Parameters
+    ----------
+    filename : str
+        name of the datafile
+
+    Returns
+    -------
+    str
+        suffix of the compression e.g. '.gz' or "" for plain datafiles
+    """
+    suffix = os.path.splitext(filename)[1]
+    return suffix if suffix in COMPRESSIONS else ""
+
+
+def open_datafile(path, mode="r"):
+    """
+    Opens a plain or compressed datafile, compressed datafiles
+    are decompressed while they are read
+
+    Parameters
+    ----------
+    path : str
+        path of the datafile
+
+    mode : str, optional
+        'r' for text or 'rb' for bytes (Default is 'r')
+
+    Returns
+    -------
+    file object
+        opened datafile
+    """
+    opener = COMPRESSIONS.get(get_compression(path), open)
+    if "b" in mode:
+        return opener(path, mode)
+    return opener(path, mode.replace("t", "") + "t", encoding="UTF-8", errors="replace")
+
 
 class Commands:
     def __init__(self, command):
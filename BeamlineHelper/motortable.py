@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:12:48 2026
+
+@author: kai
+"""
+import numpy as np
+
+
+class MotorTable:
+    """
+    Class to query the initial motorpositions of many scans at once.
+    The positions are stored in a single array with a row for every scan
+    and a collumn for every motor, so a query like
+    table.where(table["slit_small1"] < 1) runs without python loops.
+
+    Attributes
+    ----------
+        motors, list
+            names of all the motors of the scans
+
+        filenames, numpy.ndarray
+            names of the datafiles of the rows
+
+        scannumbers, numpy.ndarray
+            numbers of the scans of the rows
+
+        positions, numpy.ndarray
+            initial motorpositions with a row for every scan and a collumn
+            for every motor, nan if the motor is not stored in the file of the scan
+    """
+
+    def __init__(self, scans):
+        scans = list(scans)
+        self.motors = []
+        collumns = {}
+        # scans of the same file share their motors, so the collumns
+        # of every set of motors are only looked up once
+        groups = {}
+        for row, scan in enumerate(scans):
+            if id(scan.motors) not in groups:
+                for motor in scan.motors:
+                    if motor not in collumns:
+                        collumns[motor] = len(self.motors)
+                        self.motors.append(motor)
+                groups[id(scan.motors)] = (
+                    [collumns[motor] for motor in scan.motors],
+                    [],
+                )
+            groups[id(scan.motors)][1].append(row)
+        self.positions = np.full((len(scans), len(self.motors)), np.nan)
+        for indices, rows in groups.values():
+            if indices:
+                self.positions[np.ix_(rows, indices)] = np.vstack(
+                    [scans[row].positions for row in rows]
+                )
+        self.filenames = np.array([scan.filename for scan in scans], dtype=object)
+        self.scannumbers = np.array([scan.scannumber for scan in scans], dtype=object)
+        self.index = collumns
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, motor):
+        return motor in self.index
+
+    def __getitem__(self, motor):
+        """
+        Returns the initial positions of a motor for all scans
+
+        Parameters
+        ----------
+        motor : str
+            name of the motor
+
+        Returns
+        -------
+        numpy.ndarray
+            initial positions of the motor with nan for scans without it
+        """
+        if motor not in self.index:
+            raise KeyError(f"Motor {motor} is not stored in any scan")
+        return self.positions[:, self.index[motor]]
+
+    def where(self, mask):
+        """
+        Returns the scans selected by a boolean mask over the rows
+
+        Parameters
+        ----------
+        mask : numpy.ndarray
+            boolean array with an entry for every scan,
+            e.g. table["slit_small1"] < 1
+
+        Returns
+        -------
+        list
+            (filename, scannumber) of all selected scans
+        """
+        return list(zip(self.filenames[mask], self.scannumbers[mask]))
@@ -95,6 +95,7 @@ class OriginLoader():
                     currentBook=op.find_sheet('w', '['+scan.filename+']1').get_book()
                     current=currentBook.add_sheet(scan.scannumber)
             i=0
+            scan.data.load(scan.longnames)
             for name in scan.longnames:
                 if(i==0):
                     current.from_list(i, scan.data[name], lname=name, comments = scan.command, axis = 'X')
@@ -5,15 +5,123 @@ Created on Wed Jun 14 10:42:34 2023
 
 @author: kai
 """
+import io
+import sys
+import warnings
+from collections.abc import Mapping
+from datetime import datetime
+from functools import lru_cache
 import numpy as np
 from dateutil import parser
 
-from BeamlineHelper.misc import Commands
+from BeamlineHelper.misc import Commands, get_compression
 from BeamlineHelper.plot import Plot
 
-class Scan:
+MONTHS = {
+    "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+    "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12,
+}
+
+
+@lru_cache(maxsize=4096)
+def parse_date(date):
     """
-    Class to cache and manage a single scan from an spec dataset
+    Converts the date of a #D line, which spec writes in the fixed
+    ctime format e.g. (Wed Jun 14 10:41:10 2023). Other formats are
+    handed over to dateutil.
+
+    Parameters
+    ----------
+    date : str
+        content of the #D line
+
+    Returns
+    -------
+    datetime
+        date of the #D line
+    """
+    parts = date.split()
+    if len(parts) == 5 and parts[1] in MONTHS:
+        time = parts[3].split(":")
+        if len(time) == 3:
+            try:
+                return datetime(
+                    int(parts[4]),
+                    MONTHS[parts[1]],
+                    int(parts[2]),
+                    int(time[0]),
+                    int(time[1]),
+                    int(time[2]),
+                )
+            except ValueError:
+                pass
+    return parser.parse(date)
+
+
+@lru_cache(maxsize=256)
+def get_motors(lines):
+    """
+    Collects the motor names of the #O lines of a fileheader. Every distinct
+    set of #O lines is only split once, so all scans of a file share the
+    same tuple of interned names.
+
+    Parameters
+    ----------
+    lines : tuple
+        contents of the #O lines of the fileheader
+
+    Returns
+    -------
+    tuple
+        names of all the motors in the order of the #P positions
+    """
+    return tuple(sys.intern(motor) for line in lines for motor in line.split())
+
+
+def split_mca(lines):
+    """
+    Seperates the MCA spectra from the scalar data lines of a scan.
+    Every spectrum starts with its name e.g. '@A' and is continued on the
+    following lines as long as they end with a backslash.
+
+    Parameters
+    ----------
+    lines : list
+        data lines of the scan
+
+    Returns
+    -------
+    tuple
+        scalar data lines and a dictionary with the names of the MCAs
+        as keys and a list with the text of every spectrum as values
+    """
+    if not any(line[:1] == "@" for line in lines):
+        return lines, {}
+    data = []
+    spectra = {}
+    current = None
+    for line in lines:
+        if current is None:
+            if line[:1] != "@":
+                data.append(line)
+                continue
+            name, _, line = line.partition(" ")
+            current = []
+            spectra.setdefault(name, []).append(current)
+        if line[-1:] == "\\":
+            current.append(line[:-1])
+        else:
+            current.append(line)
+            current = None
+    for name in spectra:
+        spectra[name] = [" ".join(spectrum) for spectrum in spectra[name]]
+    return data, spectra
+
+
+class ScanHeader:
+    """
+    Class to cache the header of a single scan from an spec dataset
+    without converting its data
 
     Attributes
     ----------
@@ -23,13 +131,19 @@ class Scan:
         longnames, list
             list of all the longnames stored in the scan
 
-        data, dict
-            dictionary of all datasets stored in the scan
-            with the longnames as keys
+        points, int
+            number of data points of the scan
 
         shift, float
             energy shift of the measurement
 
+        motors, tuple
+            names of all the motors of the file,
+            shared by all scans of the file
+
+        positions, numpy.ndarray
+            initial motorpositions of the scan in the order of motors
+
         motor_position, dict
             dictionary of all initial motorpositions stored
             in the scan with the motors as keys
@@ -55,14 +169,30 @@ class Scan:
 
     """
 
-    def __init__(self, filename, fileheader, header, data):
-        # Add data
+    __slots__ = (
+        "filename",
+        "longnames",
+        "points",
+        "shift",
+        "motors",
+        "positions",
+        "command",
+        "measurement",
+        "sampletype",
+        "sample",
+        "mask",
+        "slits",
+        "scannumber",
+        "date",
+    )
+
+    def __init__(self, filename, fileheader, header, points):
         self.filename = filename
         self.longnames = header["#L"].split()
-        self.data = self.get_data(data)
+        self.points = points
         self.shift = 0
         # Add motorpositions
-        self.motor_position = self.get_motorpositions(fileheader, header)
+        self.motors, self.positions = self.get_motorpositions(fileheader, header)
         # Getting experiment type from filename
         (
             self.command,
@@ -73,66 +203,71 @@ class Scan:
             self.slits
         ) = self.get_experiment(header)
         self.scannumber = header["#S"].split()[0]
-        self.date = parser.parse(header["#D"])
+        self.date = parse_date(header["#D"])
 
-    def get_data(self, data):
+    def get_motorpositions(self, fileheader, header):
         """
-        Grab the datasets from the data collumns of the spec file
+        Grab the initial motorpositions from the headers of the spec file
 
         Parameters
         ----------
-        data : str
-            respective data collumns of the spec file
+        fileheader : str
+            main header of the entire spec file
+
+        header : str
+            header of the scan
 
         Returns
         -------
-        dict
-            dictionary of all datasets stored in the scan
-            with the longnames as keys
+        tuple
+            names of the motors and an array of their initial positions,
+            missing or unreadable positions are nan
+        """
+        motors = get_motors(
+            tuple(fileheader[key] for key in fileheader.keys() if key[:2] == "#O")
+        )
+        positions = np.full(len(motors), np.nan)
+        values = [
+            position
+            for key in header.keys()
+            if key[:2] == "#P"
+            for position in header[key].split()
+        ][: len(motors)]
+        try:
+            positions[: len(values)] = values
+        except ValueError:
+            for i, value in enumerate(values):
+                try:
+                    positions[i] = value
+                except ValueError:
+                    pass
+        return motors, positions
+
+    @property
+    def motor_position(self):
+        """
+        dictionary of all initial motorpositions stored
+        in the scan with the motors as keys
         """
-        dataset = {}
-        for name in self.longnames:
-            dataset[name] = np.array([])
-        points = []
-        for line in data:
-            points.append(np.array(line.split(), dtype=float))
-        points = np.array(points).T
-        for i in range(0, len(self.longnames)):
-            dataset[self.longnames[i]] = points[i]
-        return dataset
+        return dict(zip(self.motors, self.positions.tolist()))
 
-    def get_motorpositions(self, fileheader, header):
+    def get_motor(self, motor):
         """
-        Grab the initial motorpositions from the headers of the spec file
+        Returns the initial position of a single motor
 
         Parameters
         ----------
-        fileheader : str
-            main header of the entire spec file
-
-        header : str
-            header of the scan
+        motor : str
+            name of the motor
 
         Returns
         -------
-        dict
-            dictionary of all initial motorpositions stored
-            in the scan with the motors as keys
+        float
+            initial position of the motor or nan if it is not stored in the file
         """
-        motors = []
-        positions = []
-        motorpositions = {}
-        for key in fileheader.keys():
-            if key[:2] == "#O":
-                for motor in fileheader[key].split():
-                    motors.append(motor)
-        for key in header.keys():
-            if key[:2] == "#P":
-                for position in header[key].split():
-                    positions.append(position)
-        for i in range(0, len(motors)):
-            motorpositions[motors[i]] = positions[i]
-        return motorpositions
+        if motor in self.motors:
+            return float(self.positions[self.motors.index(motor)])
+        return np.nan
 
     def get_experiment(self, header):
         """
@@ -153,13 +288,17 @@ class Scan:
             in the scan with the motors as keys
         """
         command = " ".join(header["#S"].split()[1:])
-        namedata = self.filename.replace("-", " ")
+        # the suffix of compressed datafiles is not part of the sample name
+        filename = self.filename[
+            : len(self.filename) - len(get_compression(self.filename))
+        ]
+        namedata = filename.replace("-", " ")
         namedata = namedata.replace("_", " ").split()
-        if "-Sa-" in self.filename:
+        if "-Sa-" in filename:
             sampletype = "Sa"
             measurement = namedata[namedata.index("Sa") - 1]
             sample = namedata[namedata.index("Sa") + 1]
-        elif "-Ref-" in self.filename:
+        elif "-Ref-" in filename:
             sampletype = "Ref"
             measurement = namedata[namedata.index("Ref") -1]
             sample = namedata[namedata.index("Ref") + 1]
@@ -167,11 +306,11 @@ class Scan:
             sampletype = "None"
             measurement = namedata[1]
             sample = "None"
-        if "Mask" in self.filename:
+        if "Mask" in filename:
             mask="Yes"
         else:
             mask="None"
-        if "Slit" in self.filename:
+        if "Slit" in filename:
             slits="Yes"
         else:
             slits="None"
@@ -179,35 +318,155 @@ class Scan:
 
     def update(self, config):
         """
-        Grab important information from the
+        Exchanges the information of the scan with the one
+        defined in the timeline.csv file
 
         Parameters
         ----------
-        fileheader : str
-            main header of the entire spec file
-
-        header : str
-            header of the scan
+        config : Config
+            Config of the datapath containing the timeline
 
         Returns
         -------
-        dict
-            dictionary of all initial motorpositions stored
-            in the scan with the motors as keys
+        None
+            None
         """
-        for i in range(0, len(config.timeline)):
-            if (
-                config.timeline[i]["Filename"] == self.filename
-                and config.timeline[i]["#scan"] == self.scannumber
-            ):
-                break
-        config_data = config.timeline[i]
+        key = (self.filename, self.scannumber)
+        if not key in config.timeline_index:
+            raise KeyError(
+                f"Scan {self.scannumber} of {self.filename} is not included in timeline.csv"
+            )
+        config_data = config.timeline_index[key]
         self.measurement = config_data["Measurement"]
         self.command = config_data["Command"]
         self.sampletype = config_data["Sampletype"]
         self.sample = config_data["Sample"]
         self.shift = float(config_data["Shift"])
 
+class Scan(ScanHeader):
+    """
+    Class to cache and manage a single scan from an spec dataset
+
+    Attributes
+    ----------
+        data, ScanData
+            dictionary of all datasets stored in the scan
+            with the longnames as keys
+
+        mca, dict
+            spectra of the MCAs stored in the scan as (points x channels)
+            arrays with the names of the MCAs e.g. '@A' as keys
+
+        for the remaining attributes see ScanHeader
+    """
+
+    __slots__ = ("data", "mca")
+
+    def __init__(
+        self,
+        filename,
+        fileheader,
+        header,
+        data,
+        columns=None,
+        dtype=np.float64,
+        mca=None,
+    ):
+        super().__init__(filename, fileheader, header, 0)
+        if not isinstance(data, (np.ndarray, bytes)):
+            data, spectra = split_mca(data)
+            if mca is None:
+                mca = self.get_mca(header, spectra, dtype)
+        self.mca = mca if mca is not None else {}
+        # Add data
+        self.data = self.get_data(data, columns, dtype)
+        self.points = self.data.points
+
+    def __len__(self):
+        return self.points
+
+    @property
+    def truncated(self):
+        """
+        True if data lines of the scan were dropped, e.g. of a partially written scan
+        """
+        return self.data.truncated
+
+    def get_data(self, data, columns=None, dtype=np.float64):
+        """
+        Grab the datasets from the data collumns of the spec file.
+        The collumns are only converted when they are accessed.
+
+        Parameters
+        ----------
+        data : list, bytes or numpy.ndarray
+            respective data lines of the spec file, the undecoded data lines
+            of a memory-mapped block or the already parsed 2D array of the data points
+
+        columns : list, optional
+            longnames or positions of the only collumns to be read,
+            see ScanData (Default is None, which reads all collumns)
+
+        dtype : numpy.dtype, optional
+            data type of the converted collumns, e.g. numpy.float32
+            to halve the memory (Default is numpy.float64)
+
+        Returns
+        -------
+        ScanData
+            dictionary of all datasets stored in the scan
+            with the longnames as keys
+        """
+        return ScanData(self.filename, self.longnames, data, columns, dtype)
+
+    def get_mca(self, header, spectra, dtype=np.float64):
+        """
+        Converts the MCA spectra of the scan in bulk into 2D arrays.
+        The number of channels is taken from the #@CHANN line or
+        otherwise from the first spectrum, an incomplete last spectrum
+        is dropped.
+
+        Parameters
+        ----------
+        header : dict
+            processed header of the scan
+
+        spectra : dict
+            text of every spectrum with the names of the MCAs as keys,
+            see split_mca()
+
+        dtype : numpy.dtype, optional
+            data type of the converted spectra (Default is numpy.float64)
+
+        Returns
+        -------
+        dict
+            (points x channels) arrays with the names of the MCAs as keys
+        """
+        mca = {}
+        for name, texts in spectra.items():
+            try:
+                mca[name] = np.loadtxt(texts, dtype=dtype, ndmin=2)
+                continue
+            except ValueError:
+                # spectra of different length, e.g. a scan still being written
+                pass
+            if "#@CHANN" in header:
+                channels = int(header["#@CHANN"].split()[0])
+            else:
+                channels = len(texts[0].split())
+            values = np.array(" ".join(texts).split(), dtype=dtype)
+            if not channels:
+                continue
+            points = len(values) // channels
+            if points < len(texts):
+                warnings.warn(
+                    f"Scan {self.scannumber} of {self.filename}: "
+                    f"incomplete spectrum of {name} is dropped"
+                )
+            mca[name] = values[: points * channels].reshape(points, channels)
+        return mca
+
     def plot(self, config, axis, label="", color="", plot_only_2d=False):
         scan_axis_command = Commands(self.command).minimize()
         if not any(scan_axis_command == key for key in config.axis.keys()):
@@ -217,18 +476,371 @@ class Scan:
 
         plot_data = {}
         axislabel = {}
+        # convert all needed collumns at once
+        self.data.load(
+            [
+                name
+                for name in config.axis[scan_axis_command].values()
+                if name in self.data
+            ]
+        )
         for key in config.axis[scan_axis_command].keys():
             if not config.axis[scan_axis_command][key] in ("None", ""):
                 plot_data[key] = self.data[config.axis[scan_axis_command][key]]
                 axislabel[key] = config.axis[scan_axis_command][key]
         plot_data["Shift"] = self.shift
         if not "x1" in plot_data.keys():
-            plot_data["x1"] = list(self.data.values())[1]
-            axislabel["x1"] = list(self.data.keys())[1]
+            plot_data["x1"] = self.data[self.longnames[1]]
+            axislabel["x1"] = self.longnames[1]
         if not "y" in plot_data.keys():
-            plot_data["y"] = list(self.data.values())[2]
-            axislabel["y"] = list(self.data.keys())[2]
+            plot_data["y"] = self.data[self.longnames[2]]
+            axislabel["y"] = self.longnames[2]
         if plot_only_2d and ("x2" in plot_data.keys()):
             return axis
 
         return Plot(axis, plot_data, axislabel, label, color).axis
+
+
+class ScanData(Mapping):
+    """
+    Dictionary of all datasets stored in a scan with the longnames as keys.
+    The data lines are kept as they are (as a list or as a single bytes
+    object of a memory-mapped block) and a collumn is only converted
+    into an array when it is accessed for the first time.
+    Several collumns can be converted in a single pass using load().
+    If only some collumns are requested (projection), all others are
+    skipped while reading and are not part of the dictionary.
+    The collumns are stored in one 2D array in the order of the longnames
+    (or of the projection), which is allocated once in collumn-major order
+    and filled in place as the collumns are converted, so every collumn is
+    contiguous and the dictionary returns views into it.
+
+    Attributes
+    ----------
+        filename, str
+            name of the file
+
+        longnames, list
+            list of all the longnames stored in the scan
+
+        points, int
+            number of data points
+
+        projection, list
+            longnames of the requested collumns
+            or None if all collumns are available
+
+        array, numpy.ndarray
+            2D array of the collumns with one row per data point
+
+        index, dict
+            position of the collumns in the array with the longnames as keys
+
+        loaded, set
+            longnames of the converted collumns
+
+        dtype, numpy.dtype
+            data type of the converted collumns
+
+        truncated, boolean
+            True if unreadable data lines at the end were dropped
+    """
+
+    __slots__ = (
+        "filename",
+        "longnames",
+        "positions",
+        "projection",
+        "points",
+        "lines",
+        "array",
+        "index",
+        "loaded",
+        "dtype",
+        "truncated",
+    )
+
+    def __init__(self, filename, longnames, data, projection=None, dtype=np.float64):
+        self.filename = filename
+        self.longnames = longnames
+        self.dtype = np.dtype(dtype)
+        self.truncated = False
+        self.positions = {name: i for i, name in enumerate(longnames)}
+        self.projection = None
+        if projection is not None:
+            self.projection = self.resolve(projection)
+            self.positions = {name: self.positions[name] for name in self.projection}
+        self.array = None
+        self.index = {name: i for i, name in enumerate(self.positions)}
+        self.loaded = set()
+        self.lines = None
+        if isinstance(data, np.ndarray):
+            self.points = len(data)
+            if self.projection is None:
+                self.array = data.astype(self.dtype, copy=False)
+            else:
+                # copy, so the skipped collumns can be freed
+                self.array = np.ascontiguousarray(
+                    data[:, list(self.positions.values())], dtype=self.dtype
+                )
+            self.loaded = set(self.positions)
+        else:
+            if isinstance(data, bytes):
+                # the block is not split into single lines
+                self.lines = data.strip()
+                first = self.lines[: self.lines.find(b"\n")]
+                last = self.lines[self.lines.rfind(b"\n") + 1 :]
+                self.points = self.lines.count(b"\n") + 1 if self.lines else 0
+            else:
+                self.lines = list(data)
+                first = self.lines[0] if self.lines else ""
+                last = self.lines[-1] if self.lines else ""
+                self.points = len(self.lines)
+            # A truncated last line, e.g. of a scan which is still being written
+            if self.points > 1 and len(last.split()) < len(first.split()):
+                self.drop_last_line()
+            # collumn by collumn, so the collumns not converted yet take no memory
+            self.array = np.empty(
+                (self.points, len(self.positions)), dtype=self.dtype, order="F"
+            )
+            if not self.lines:
+                self.loaded = set(self.positions)
+                self.lines = None
+            elif self.projection is not None:
+                self.load(self.positions)
+
+    def __getitem__(self, name):
+        if not name in self.loaded:
+            if not name in self.positions:
+                raise KeyError(name)
+            self.load([name])
+        return self.array[:, self.index[name]]
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def values(self):
+        self.load(self.positions)
+        return super().values()
+
+    def items(self):
+        self.load(self.positions)
+        return super().items()
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the converted collumns and the remaining data lines
+        """
+        # the memory of collumns not converted yet is not used
+        size = self.array.itemsize * len(self.array) * len(self.loaded)
+        if isinstance(self.lines, bytes):
+            size += len(self.lines)
+        elif self.lines is not None:
+            size += sum(len(line) for line in self.lines)
+        return size
+
+    def resolve(self, projection):
+        """
+        Translates a projection into the longnames of the scan
+
+        Parameters
+        ----------
+        projection : list
+            longnames or positions of collumns, longnames which are not
+            part of the scan are ignored
+
+        Returns
+        -------
+        list
+            longnames of the collumns
+        """
+        names = []
+        for name in projection:
+            if isinstance(name, int):
+                if not -len(self.longnames) <= name < len(self.longnames):
+                    continue
+                name = self.longnames[name]
+            if name in self.longnames and not name in names:
+                names.append(name)
+        return names
+
+    def provides(self, projection):
+        """
+        Checks if all collumns of a projection are available
+
+        Parameters
+        ----------
+        projection : list
+            longnames or positions of collumns
+            or None for all collumns
+
+        Returns
+        -------
+        boolean
+            True if all the collumns are available
+        """
+        if self.projection is None:
+            return True
+        if projection is None:
+            return False
+        return all(name in self.positions for name in self.resolve(projection))
+
+    def drop_last_line(self):
+        warnings.warn("Scan " + self.filename + ": dropped truncated last line")
+        self.lines = self.without_last_line()
+        self.points -= 1
+        self.truncated = True
+        if self.array is not None:
+            # the collumns converted before keep their values
+            self.array = np.array(self.array[: self.points])
+
+    def salvage(self):
+        """
+        Drops all data lines from the first unreadable one on, which is
+        searched by bisection, and converts the remaining ones
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        int
+            number of the remaining data points
+        """
+        if self.lines is None:
+            return self.points
+        lines = self.lines
+        if isinstance(lines, bytes):
+            lines = lines.decode("UTF-8", errors="replace").splitlines()
+        usecols = list(self.positions.values())
+        good, bad = 0, len(lines)
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            try:
+                self.read_lines(lines[:middle], usecols)
+                good = middle
+            except ValueError:
+                bad = middle
+        warnings.warn(
+            f"Scan {self.filename}: salvaged {good} of {len(lines)} data lines"
+        )
+        self.lines = lines[:good]
+        self.points = good
+        self.truncated = True
+        self.array = np.empty((good, len(self.positions)), dtype=self.dtype, order="F")
+        self.loaded = set()
+        if good:
+            self.load(self.positions)
+        else:
+            self.loaded = set(self.positions)
+            self.lines = None
+        return good
+
+    def without_last_line(self):
+        """
+        Returns the data lines without the last one
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        list or bytes
+            data lines without the last one
+        """
+        if isinstance(self.lines, bytes):
+            return self.lines[: max(self.lines.rfind(b"\n"), 0)]
+        return self.lines[:-1]
+
+    def read_lines(self, lines, usecols):
+        """
+        Converts the given collumns of the data lines with the C parser of numpy
+
+        Parameters
+        ----------
+        lines : list or bytes
+            data lines
+
+        usecols : list
+            positions of the collumns
+
+        Returns
+        -------
+        numpy.ndarray
+            2D array with one row per data line
+        """
+        if isinstance(lines, bytes):
+            lines = io.BytesIO(lines)
+        return np.loadtxt(lines, dtype=self.dtype, usecols=usecols, ndmin=2)
+
+    def load(self, names):
+        """
+        Converts the given collumns in a single pass over the data lines
+        and writes them into their collumns of the array
+
+        Parameters
+        ----------
+        names : list
+            longnames of the collumns
+
+        Returns
+        -------
+        None
+            None
+        """
+        names = [name for name in dict.fromkeys(names) if not name in self.loaded]
+        for name in names:
+            if not name in self.positions:
+                raise KeyError(name)
+        if not names:
+            return
+        usecols = [self.positions[name] for name in names]
+        try:
+            points = self.read_lines(self.lines, usecols)
+        except ValueError as error:
+            # retry without a broken last line
+            if self.points < 2:
+                raise ValueError("Scan " + self.filename + ": " + str(error))
+            try:
+                points = self.read_lines(self.without_last_line(), usecols)
+            except ValueError:
+                raise ValueError("Scan " + self.filename + ": " + str(error))
+            self.drop_last_line()
+        if names == list(self.positions):
+            # everything at once, no need to copy into the allocated array
+            self.array = points
+        else:
+            self.array[:, [self.index[name] for name in names]] = points
+        self.loaded.update(names)
+        if len(self.loaded) == len(self.positions):
+            # everything is converted, the data lines are no longer needed
+            self.lines = None
+
+    def get_array(self):
+        """
+        Converts all collumns and returns them as a single array
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        numpy.ndarray
+            2D array with one row per data point and one collumn per
+            longname (or per requested longname of a projection)
+        """
+        self.load(self.positions)
+        return self.array
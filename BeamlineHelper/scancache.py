@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:20:37 2026
+
+@author: kai
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ScanCache:
+    """
+    Class to keep recently read scans in memory. The least recently used scans
+    are dropped as soon as the estimated memory of all cached scans exceeds the budget.
+
+    Attributes
+    ----------
+        size, int
+            memory budget of the cache in bytes
+
+        used, int
+            estimated memory of all cached scans in bytes
+
+        hits, int
+            number of scans found in the cache
+
+        misses, int
+            number of scans not found in the cache
+
+        evictions, int
+            number of scans dropped to stay within the budget
+    """
+
+    # estimated memory of a scan without its data
+    overhead = 4096
+
+    def __init__(self, size=512 * 2**20):
+        self.size = size
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.scans = OrderedDict()
+
+    def __len__(self):
+        return len(self.scans)
+
+    def sizeof(self, scan):
+        """
+        Estimates the memory used by a scan including its MCA spectra,
+        memory-mapped spectra are not counted
+
+        Parameters
+        ----------
+        scan : Scan
+            Scan to be estimated
+
+        Returns
+        -------
+        int
+            estimated memory in bytes
+        """
+        size = self.overhead + scan.data.nbytes
+        for spectra in scan.mca.values():
+            if not isinstance(spectra, np.memmap):
+                size += spectra.nbytes
+        return size
+
+    def get(self, filename, scannumber, mtime):
+        """
+        Returns a cached scan, if it was read from the current state of its file
+
+        Parameters
+        ----------
+        filename : str
+            Name of the datafile
+
+        scannumber : str
+            Number of the scan in the file
+
+        mtime : int
+            Modification time of the datafile in ns
+
+        Returns
+        -------
+        Scan
+            Cached scan or None if the scan is not cached
+        """
+        key = (filename, str(scannumber))
+        if key in self.scans:
+            if self.scans[key][0] == mtime:
+                self.scans.move_to_end(key)
+                self.hits += 1
+                scan = self.scans[key][1]
+                # collumns converted since the scan was cached change its size
+                self.resize(key)
+                return scan
+            # the file changed since the scan was cached
+            self.remove(key)
+        self.misses += 1
+        return None
+
+    def put(self, filename, scannumber, mtime, scan):
+        """
+        Adds a scan to the cache and drops the least recently used scans
+        until the cache fits into its budget again
+
+        Parameters
+        ----------
+        filename : str
+            Name of the datafile
+
+        scannumber : str
+            Number of the scan in the file
+
+        mtime : int
+            Modification time of the datafile in ns
+
+        scan : Scan
+            Scan to be cached
+
+        Returns
+        -------
+        None
+            None
+        """
+        key = (filename, str(scannumber))
+        if key in self.scans:
+            self.remove(key)
+        size = self.sizeof(scan)
+        if size > self.size:
+            return
+        while self.used + size > self.size:
+            self.remove(next(iter(self.scans)))
+            self.evictions += 1
+        self.scans[key] = (mtime, scan, size)
+        self.used += size
+
+    def resize(self, key):
+        """
+        Estimates the memory of a cached scan again and drops the least
+        recently used other scans, if the cache no longer fits into its budget
+
+        Parameters
+        ----------
+        key : tuple
+            filename and scannumber of the scan
+
+        Returns
+        -------
+        None
+            None
+        """
+        mtime, scan, size = self.scans[key]
+        self.scans[key] = (mtime, scan, self.sizeof(scan))
+        self.used += self.scans[key][2] - size
+        while self.used > self.size and len(self.scans) > 1:
+            self.remove(next(iter(self.scans)))
+            self.evictions += 1
+
+    def remove(self, key):
+        mtime, scan, size = self.scans.pop(key)
+        self.used -= size
+
+    def clear(self):
+        """
+        Drops all cached scans
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        None
+            None
+        """
+        self.scans.clear()
+        self.used = 0
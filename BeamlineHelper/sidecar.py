@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:02:15 2026
+
+@author: kai
+"""
+import os
+import json
+import hashlib
+import numpy as np
+
+
+class Sidecar:
+    """
+    Class to cache the parsed content of a spec datafile in a binary form.
+    The cache is stored in datapath/config/cache and consists of a .npz file
+    containing the data points of every scan, a .json file containing
+    the headers and a .npy file for every MCA, which is memory-mapped
+    when it is loaded. It is only used as long as size, mtime and a hash of the
+    beginning and the end of the datafile did not change. For compressed
+    datafiles the hash is taken from the compressed bytes.
+
+    Attributes
+    ----------
+        datapath
+            absolute path to the file storing the measurement data
+        filename
+            name of the datafile
+        dtype
+            data type of the cached data points
+    """
+
+    # number of bytes hashed at the beginning and the end of the datafile
+    hashsize = 2**20
+    # format of the cache, caches of other versions are ignored
+    version = 5
+
+    def __init__(self, datapath, filename, dtype=np.float64):
+        self.datapath = datapath
+        self.filename = filename
+        self.dtype = np.dtype(dtype)
+        self.path = datapath + "/config/cache/" + filename
+        self.meta = None
+        self.stamp = None
+
+    def get_key(self):
+        """
+        Generates the key of the current state of the datafile
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        dict
+            size, mtime and content hash of the datafile
+        """
+        path = self.datapath + "/" + self.filename
+        stat = os.stat(path)
+        content = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as datafile:
+            content.update(datafile.read(self.hashsize))
+            if stat.st_size > self.hashsize:
+                datafile.seek(max(self.hashsize, stat.st_size - self.hashsize))
+                content.update(datafile.read())
+        return {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": content.hexdigest(),
+        }
+
+    def is_valid(self):
+        """
+        Checks if the cache matches the current state of the datafile.
+        The hash is only recalculated if size or mtime changed since the last check.
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        boolean
+            True if the cache can be used
+        """
+        stat = os.stat(self.datapath + "/" + self.filename)
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        if self.meta is not None and self.stamp == stamp:
+            return True
+        self.meta = None
+        if not os.path.exists(self.path + ".json"):
+            return False
+        try:
+            with open(self.path + ".json", encoding="UTF-8") as metafile:
+                meta = json.load(metafile)
+        except (OSError, ValueError):
+            return False
+        if (
+            meta.get("version") != self.version
+            or meta["dtype"] != self.dtype.str
+            or meta["key"] != self.get_key()
+        ):
+            return False
+        self.meta = meta
+        self.stamp = stamp
+        return True
+
+    def load(self):
+        """
+        Loads all scans of the datafile from the cache
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        tuple
+            fileheader and a list of (header, points, mca) for every scan
+            or None if the cache is not valid
+        """
+        if not self.is_valid():
+            return None
+        with np.load(self.path + ".npz") as points:
+            scans = [
+                (header, points[str(i)], self.load_mca(i))
+                for i, header in enumerate(self.meta["scans"])
+            ]
+        return self.meta["fileheader"], scans
+
+    def load_mca(self, i):
+        """
+        Memory-maps the MCA spectra of a scan from the cache
+
+        Parameters
+        ----------
+        i : int
+            position of the scan in the datafile
+
+        Returns
+        -------
+        dict
+            read only (points x channels) arrays with the names
+            of the MCAs as keys
+        """
+        return {
+            name: np.load(f"{self.path}.mca/{i}_{j}.npy", mmap_mode="r")
+            for j, name in enumerate(self.meta["mca"][i])
+        }
+
+    def load_scans(self, scannumbers):
+        """
+        Loads several scans of the datafile from the cache
+        without loading the others
+
+        Parameters
+        ----------
+        scannumbers : list
+            Numbers of the scans in the file as written in the #S lines
+
+        Returns
+        -------
+        tuple
+            fileheader and a list of (header, points, mca) for every requested scan
+            or None if the cache is not valid or does not contain all the scans
+        """
+        if not self.is_valid():
+            return None
+        positions = {}
+        for i, header in enumerate(self.meta["scans"]):
+            scannumber = header["#S"].split()[0]
+            if not scannumber in positions:
+                positions[scannumber] = i
+        if not all(scannumber in positions for scannumber in scannumbers):
+            return None
+        with np.load(self.path + ".npz") as points:
+            scans = [
+                (
+                    self.meta["scans"][positions[scannumber]],
+                    points[str(positions[scannumber])],
+                    self.load_mca(positions[scannumber]),
+                )
+                for scannumber in scannumbers
+            ]
+        return self.meta["fileheader"], scans
+
+    def load_headers(self):
+        """
+        Loads the headers of all scans of the datafile from the cache
+        without touching the data points
+
+        Parameters
+        ----------
+        None
+            None
+
+        Returns
+        -------
+        tuple
+            fileheader and a list of (header, number of points) for every scan
+            or None if the cache is not valid
+        """
+        if not self.is_valid():
+            return None
+        return self.meta["fileheader"], list(zip(self.meta["scans"], self.meta["points"]))
+
+    def save(self, fileheader, scans, key, diagnostics=[], truncated=[]):
+        """
+        Writes the parsed scans of the datafile into the cache
+
+        Parameters
+        ----------
+        fileheader : dict
+            processed main header of the datafile
+
+        scans : list
+            list of (header, points, mca) for every scan
+
+        key : dict
+            key of the datafile generated before it was parsed
+
+        diagnostics : list, optional
+            scans which could not be read, see DataFile.diagnostics
+            (Default is [])
+
+        truncated : list, optional
+            positions of the scans with dropped data lines (Default is [])
+
+        Returns
+        -------
+        None
+            None
+        """
+        meta = {
+            "version": self.version,
+            "dtype": self.dtype.str,
+            "key": key,
+            "fileheader": fileheader,
+            "scans": [header for header, points, mca in scans],
+            "points": [len(points) for header, points, mca in scans],
+            "mca": [list(mca) for header, points, mca in scans],
+            "diagnostics": list(diagnostics),
+            "truncated": list(truncated),
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp.npz", "wb") as pointfile:
+                np.savez(
+                    pointfile,
+                    **{str(i): points for i, (header, points, mca) in enumerate(scans)},
+                )
+            os.replace(self.path + ".tmp.npz", self.path + ".npz")
+            for i, (header, points, mca) in enumerate(scans):
+                for j, spectra in enumerate(mca.values()):
+                    os.makedirs(self.path + ".mca", exist_ok=True)
+                    # replaced and not overwritten, older caches may still be mapped
+                    with open(f"{self.path}.mca/tmp.npy", "wb") as mcafile:
+                        np.save(mcafile, np.asarray(spectra))
+                    os.replace(f"{self.path}.mca/tmp.npy", f"{self.path}.mca/{i}_{j}.npy")
+            with open(self.path + ".tmp.json", "w", encoding="UTF-8") as metafile:
+                json.dump(meta, metafile)
+            os.replace(self.path + ".tmp.json", self.path + ".json")
+        except OSError:
+            # the cache is optional, e.g. on read only beamtime folders
+            return
+        self.meta = meta
+        self.stamp = (meta["key"]["size"], meta["key"]["mtime"])
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:41:06 2026
+
+@author: kai
+"""
+import sqlite3
+
+
+class TimelineStore:
+    """
+    Class to mirror the csv files of the config in a SQLite database, so
+    the timeline can be filtered with indexed queries instead of python loops.
+    The database is stored in datapath/config/timeline.sqlite and holds a
+    table for the timeline.csv, the axis.csv and the edges.csv with all
+    entries stored as text and the position of every row in the csv file.
+    The collumns are stored as c0, c1, ... since the names in the csv file
+    may only differ in case, which SQLite does not distinguish.
+    Together with the rows the size and mtime of the csv file are stored,
+    so an unchanged csv file is taken from the database without parsing it.
+
+    Attributes
+    ----------
+        path
+            path of the database file
+
+        collumns
+            collumns of the tables with the names of the tables as keys
+    """
+
+    # collumns of the timeline with an index
+    indexed = [("Filename", "#scan"), ("Measurement",), ("Sample",), ("Command",), ("Group",)]
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS stamps (name TEXT PRIMARY KEY, size INTEGER, mtime INTEGER)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS collumns "
+            "(tab TEXT, position INTEGER, name TEXT, PRIMARY KEY (tab, position))"
+        )
+        self.connection.commit()
+        self.collumns = {}
+        for table, name in self.connection.execute(
+            "SELECT tab, name FROM collumns ORDER BY tab, position"
+        ):
+            self.collumns.setdefault(table, []).append(name)
+
+    def close(self):
+        self.connection.close()
+
+    def get_stamp(self, table):
+        """
+        Returns the size and mtime of the csv file the table was loaded from
+
+        Parameters
+        ----------
+        table : str
+            name of the table
+
+        Returns
+        -------
+        tuple
+            size and mtime of the csv file or None if the table was never loaded
+        """
+        if not table in self.collumns:
+            return None
+        stamp = self.connection.execute(
+            "SELECT size, mtime FROM stamps WHERE name = ?", (table,)
+        ).fetchone()
+        return tuple(stamp) if stamp is not None else None
+
+    def load(self, table, rows, stamp):
+        """
+        Replaces the content of a table by the rows of a csv file
+
+        Parameters
+        ----------
+        table : str
+            name of the table
+        rows : list
+            rows of the csv file in the format of Config.csv_read()
+        stamp : tuple
+            size and mtime of the csv file
+
+        Returns
+        -------
+        None
+            None
+        """
+        collumns = list(rows[0]) if rows else self.collumns.get(table, [])
+        with self.connection:
+            self.connection.execute(f"DROP TABLE IF EXISTS {quote(table)}")
+            self.connection.execute(
+                f"CREATE TABLE {quote(table)} (position INTEGER PRIMARY KEY"
+                + "".join(f", c{i} TEXT" for i in range(len(collumns)))
+                + ")"
+            )
+            self.connection.execute("DELETE FROM collumns WHERE tab = ?", (table,))
+            self.connection.executemany(
+                "INSERT INTO collumns VALUES (?, ?, ?)",
+                [(table, i, name) for i, name in enumerate(collumns)],
+            )
+            if table == "timeline":
+                for names in self.indexed:
+                    if all(name in collumns for name in names):
+                        self.connection.execute(
+                            f"CREATE INDEX {quote('timeline_' + '_'.join(names))} ON timeline ("
+                            + ", ".join(f"c{collumns.index(name)}" for name in names)
+                            + ")"
+                        )
+            self.connection.executemany(
+                f"INSERT INTO {quote(table)} VALUES (?{', ?' * len(collumns)})",
+                (
+                    [position] + [row.get(name) for name in collumns]
+                    for position, row in enumerate(rows)
+                ),
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO stamps VALUES (?, ?, ?)", (table, *stamp)
+            )
+        self.collumns[table] = collumns
+
+    def rows(self, table):
+        """
+        Returns all rows of a table in the order of the csv file
+
+        Parameters
+        ----------
+        table : str
+            name of the table
+
+        Returns
+        -------
+        list
+            rows in the format of Config.csv_read()
+        """
+        collumns = self.collumns.get(table, [])
+        if not collumns:
+            return []
+        return [
+            dict(zip(collumns, row))
+            for row in self.connection.execute(
+                f"SELECT {', '.join(f'c{i}' for i in range(len(collumns)))} "
+                f"FROM {quote(table)} ORDER BY position"
+            )
+        ]
+
+    def select(self, table, filters={}):
+        """
+        Returns the positions of the rows matching the filters
+
+        Parameters
+        ----------
+        table : str
+            name of the table
+        filters : dict, optional
+            allowed values of the collumns with the collumns as keys,
+            every row has to match all of them (Default is {})
+
+        Returns
+        -------
+        list
+            positions of the matching rows in the csv file in ascending order
+        """
+        if not self.collumns.get(table):
+            return []
+        where, values = self.where(table, filters)
+        return [
+            position
+            for (position,) in self.connection.execute(
+                f"SELECT position FROM {quote(table)}{where} ORDER BY position", values
+            )
+        ]
+
+    def distinct(self, table, collumn, filters={}, restrictions=[]):
+        """
+        Returns the different values of a collumn of the rows matching the filters
+
+        Parameters
+        ----------
+        table : str
+            name of the table
+        collumn : str
+            name of the collumn
+        filters : dict, optional
+            allowed values of the collumns with the collumns as keys,
+            every row has to match all of them (Default is {})
+        restrictions : list, optional
+            values every row has to contain in any of its collumns (Default is [])
+
+        Returns
+        -------
+        list
+            values of the collumn in the order they first appear in the csv file
+        """
+        if collumn not in self.collumns.get(table, []):
+            return []
+        where, values = self.where(table, filters, restrictions)
+        name = self.get_name(table, collumn)
+        return [
+            value
+            for (value,) in self.connection.execute(
+                f"SELECT {name} FROM {quote(table)}{where} "
+                f"GROUP BY {name} ORDER BY MIN(position)",
+                values,
+            )
+        ]
+
+    def get_name(self, table, collumn):
+        """
+        Returns the name of a collumn in the database
+
+        Parameters
+        ----------
+        table : str
+            name of the table
+        collumn : str
+            name of the collumn in the csv file
+
+        Returns
+        -------
+        str
+            name of the collumn in the database
+        """
+        return f"c{self.collumns[table].index(collumn)}"
+
+    def where(self, table, filters, restrictions=[]):
+        """
+        Builds the WHERE clause of a query
+
+        Parameters
+        ----------
+        table : str
+            name of the table
+        filters : dict
+            allowed values of the collumns with the collumns as keys
+        restrictions : list, optional
+            values every row has to contain in any of its collumns (Default is [])
+
+        Returns
+        -------
+        tuple
+            WHERE clause and the values of its placeholders
+        """
+        conditions = []
+        values = []
+        for name, allowed in filters.items():
+            allowed = list(allowed)
+            if name not in self.collumns[table] or not allowed:
+                conditions.append("0")
+                continue
+            conditions.append(
+                f"{self.get_name(table, name)} IN ({', '.join('?' * len(allowed))})"
+            )
+            values += allowed
+        for item in restrictions:
+            conditions.append(
+                "("
+                + " OR ".join(f"c{i} = ?" for i in range(len(self.collumns[table])))
+                + ")"
+            )
+            values += [item] * len(self.collumns[table])
+        if not conditions:
+            return "", values
+        return " WHERE " + " AND ".join(conditions), values
+
+
+def quote(name):
+    """
+    Quotes the name of a table or index for SQL, e.g. for 'timeline_#scan'
+
+    Parameters
+    ----------
+    name : str
+        name of the table or index
+
+    Returns
+    -------
+    str
+        quoted name
+    """
+    return '"' + name.replace('"', '""') + '"'
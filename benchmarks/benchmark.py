@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:12:40 2026
+
+@author: kai
+
+Micro-benchmarks for the reading paths of BeamlineHelper.
+Run all of them with
+
+    python benchmarks/benchmark.py
+
+or only some of them by passing their names, e.g. 'get_data'.
+"""
+import os
+import sys
+import io
+import time
+import random
+import tempfile
+import contextlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dateutil import parser
+
+from BeamlineHelper.scan import Scan, parse_date
+from BeamlineHelper.datafile import DataFile
+from BeamlineHelper.config import Config
+from BeamlineHelper.store import TimelineStore
+
+COLLUMNS = [
+    "Measurement", "Date", "Time", "Filename", "#scan", "Command",
+    "Sampletype", "Sample", "Mask", "Data_Points", "Shift", "Group",
+]
+
+
+def make_beamtime(datapath, files=4, scans=50, points=200, counters=40):
+    """
+    Writes synthetic spec files into datapath
+    """
+    random.seed(0)
+    longnames = ["Energy", "Epoch", "Ioni1", "APD"] + [
+        "Counter" + str(i) for i in range(counters - 4)
+    ]
+    minute = 0
+    for i in range(files):
+        filename = "Beamtime-XanesL3-Sa-Sample" + str(i)
+        with open(os.path.join(datapath, filename), "w", encoding="UTF-8") as datafile:
+            datafile.write("#F " + filename + "\n#E 1686737000\n")
+            datafile.write("#D Wed Jun 14 10:41:10 2023\n")
+            datafile.write("#O0 slit_small1 slit_small2 sx\n#O1 sy sz\n\n")
+            for j in range(scans):
+                minute += 1
+                datafile.write(f"#S {j + 1} ascan energy 5.8 5.9 {points} 1\n")
+                datafile.write(
+                    f"#D Wed Jun 14 {10 + minute // 60 % 14:02d}:{minute % 60:02d}:00 2023\n"
+                )
+                datafile.write("#P0 0.5 2.0 0.1\n#P1 0.2 0.3\n")
+                datafile.write("#L " + "  ".join(longnames) + "\n")
+                for _ in range(points):
+                    datafile.write(
+                        " ".join(f"{random.random():.6g}" for _ in longnames) + "\n"
+                    )
+                datafile.write("\n")
+    return datapath
+
+
+def timeit(function, repeat=5):
+    """
+    Returns the best time of several runs of function in seconds
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name, seconds, amount=None, unit=""):
+    line = f"{name:<40s}{seconds * 1e3:10.2f} ms"
+    if amount:
+        line += f"{amount / seconds:14.0f} {unit}/s"
+    print(line)
+
+
+def legacy_get_data(longnames, data):
+    # the line-by-line parser used before the bulk conversion
+    dataset = {}
+    points = []
+    for line in data:
+        points.append(np.array(line.split(), dtype=float))
+    points = np.array(points).T
+    for i in range(0, len(longnames)):
+        dataset[longnames[i]] = points[i]
+    return dataset
+
+
+def legacy_csv_read(path, delimiter_position):
+    # the string substitution parser used before the csv module
+    out = []
+    first = True
+    with open(path, encoding="UTF-8") as datafile:
+        for line in datafile:
+            content = line.replace('"', "").strip()
+            if first:
+                content = content.replace(" ", "")
+                delimiter = content[delimiter_position]
+            content = content.replace(" ", "[space]").strip()
+            for i in range(0, 10):
+                content = content.replace(2 * delimiter, delimiter + "None" + delimiter)
+            if content[-1] == delimiter:
+                content += "None"
+            content = content.replace(delimiter, " ").strip()
+            if first:
+                names = content.split()
+                first = False
+            elif content.replace("None", "") != "":
+                data = content.split()
+                if len(names) == len(data):
+                    out.append(
+                        {name: data[i].strip().replace("[space]", " ")
+                         for i, name in enumerate(names)}
+                    )
+    return out
+
+
+def bench_get_data(datapath, points=2000, counters=40):
+    random.seed(0)
+    longnames = ["Counter" + str(i) for i in range(counters)]
+    data = [
+        " ".join(f"{random.random():.6g}" for _ in longnames) for _ in range(points)
+    ]
+    scan = Scan.__new__(Scan)
+    scan.filename = "benchmark"
+    scan.longnames = longnames
+    report("get_data (line by line)", timeit(lambda: legacy_get_data(longnames, data)),
+           points, "points")
+    report("get_data (bulk, all collumns)",
+           timeit(lambda: scan.get_data(data).load(longnames)), points, "points")
+    report("get_data (lazy, 3 collumns)",
+           timeit(lambda: scan.get_data(data).load(longnames[:3])), points, "points")
+
+
+def bench_read_raw(datapath):
+    make_beamtime(datapath, files=1, scans=100, points=500)
+    filename = os.listdir(datapath)[0]
+    points = 100 * 500
+    report("read_raw (text)", timeit(lambda: DataFile(datapath, filename, cache=False).read_raw()),
+           points, "points")
+    DataFile(datapath, filename).read_raw()
+    report("read_raw (sidecar cache)", timeit(lambda: DataFile(datapath, filename).read_raw()),
+           points, "points")
+
+
+def bench_read_scan(datapath, scans=1000):
+    make_beamtime(datapath, files=1, scans=scans, points=200)
+    filename = os.listdir(datapath)[0]
+    datafile = DataFile(datapath, filename, cache=False)
+    report("build index (memory-mapped)", timeit(datafile.build_index), scans, "scans")
+    report("read_scan (one of 1000, all collumns)",
+           timeit(lambda: datafile.read_scan(str(scans // 2)).data.get_array()), 200, "points")
+
+
+def bench_make(datapath):
+    make_beamtime(datapath, files=10, scans=50, points=200)
+    with contextlib.redirect_stdout(io.StringIO()):
+        config = Config(datapath, COLLUMNS)
+
+    def separate_passes():
+        config.make_timeline(COLLUMNS, [])
+        config.make_axis([])
+
+    report("make timeline+axis (two passes)", timeit(separate_passes), 500, "scans")
+    report("make timeline+axis (one pass)",
+           timeit(lambda: config.make(COLLUMNS, force=True)), 500, "scans")
+
+
+def bench_parse_date(datapath, scans=2000):
+    dates = [
+        f"Wed Jun {1 + i // 1440 % 28:2d} {i // 60 % 24:02d}:{i % 60:02d}:00 2023"
+        for i in range(scans)
+    ]
+
+    def fixed_format():
+        parse_date.cache_clear()
+        for date in dates:
+            parse_date(date)
+
+    report("parse #D (dateutil)", timeit(lambda: [parser.parse(date) for date in dates]),
+           scans, "scans")
+    report("parse #D (fixed format)", timeit(fixed_format), scans, "scans")
+    report("parse #D (memoized)", timeit(lambda: [parse_date(date) for date in dates]),
+           scans, "scans")
+
+
+def bench_mca(datapath, points=500, channels=2048):
+    random.seed(0)
+    filename = "Beamtime-RixsM4-Sa-Sample0"
+    with open(os.path.join(datapath, filename), "w", encoding="UTF-8") as datafile:
+        datafile.write("#F " + filename + "\n#D Wed Jun 14 10:41:10 2023\n\n")
+        datafile.write(f"#S 1 ascan energy 5.8 5.9 {points} 1\n")
+        datafile.write("#D Wed Jun 14 10:42:00 2023\n")
+        datafile.write(f"#@MCA %16C\n#@CHANN {channels} 0 {channels - 1} 1\n")
+        datafile.write("#L Energy Epoch Ioni1\n")
+        for i in range(points):
+            datafile.write(f"{i * 0.1:.3f} {i} {random.random():.6g}\n")
+            spectrum = [str(random.randrange(1000)) for _ in range(channels)]
+            datafile.write("@A " + " \\\n".join(
+                " ".join(spectrum[j:j + 16]) for j in range(0, channels, 16)
+            ) + "\n")
+    report("read_scan with MCA (text)",
+           timeit(lambda: DataFile(datapath, filename, cache=False).read_scan("1")),
+           points, "spectra")
+    DataFile(datapath, filename).read_raw()
+    report("read_scan with MCA (memory-mapped)",
+           timeit(lambda: DataFile(datapath, filename).read_scan("1")), points, "spectra")
+
+
+def make_timeline(datapath, rows=20000):
+    """
+    Writes a config/timeline.csv with the given number of rows
+    """
+    random.seed(0)
+    os.makedirs(os.path.join(datapath, "config"))
+    path = os.path.join(datapath, "config", "timeline.csv")
+    with open(path, "w", encoding="UTF-8") as datafile:
+        datafile.write(";".join(COLLUMNS) + "\n")
+        for i in range(rows):
+            datafile.write(";".join([
+                random.choice(["XanesL3", "XanesM4", "RixsM4"]), "14-06-2023",
+                f"{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+                f"Beamtime-XanesL3-Sa-Sample{i // 100}", str(i % 100 + 1),
+                "ascan energy 5.8 5.9 200 1", "Sa", f"Sample{i // 100}",
+                random.choice(["None", ""]), "200", "0", str(i // 100 + 1),
+            ]) + "\n")
+    return path
+
+
+def bench_csv_read(datapath, rows=20000):
+    path = make_timeline(datapath, rows)
+    config = Config.__new__(Config)
+    config.datapath = datapath
+    if legacy_csv_read(path, 11) != config.csv_read("timeline.csv"):
+        raise Exception("csv_read differs from the legacy parser")
+    report("csv_read timeline (string substitution)",
+           timeit(lambda: legacy_csv_read(path, 11)), rows, "rows")
+    report("csv_read timeline (csv module)",
+           timeit(lambda: config.csv_read("timeline.csv")), rows, "rows")
+
+
+def bench_query(datapath, rows=20000):
+    make_timeline(datapath, rows)
+    config = Config.__new__(Config)
+    config.datapath = datapath
+    config.store = None
+    config.timeline = config.csv_read("timeline.csv")
+    store = Config.__new__(Config)
+    store.timeline = config.timeline
+    store.store = TimelineStore(os.path.join(datapath, "config", "timeline.sqlite"))
+    store.store.load("timeline", store.timeline, (0, 0))
+    filters = {"Measurement": ["RixsM4"], "Sample": ["Sample42"], "Command": ["All"]}
+    if config.select(filters) != store.select(filters):
+        raise Exception("sqlite query differs from the csv backend")
+    report("select one sample (csv)", timeit(lambda: config.select(filters)), rows, "rows")
+    report("select one sample (sqlite)", timeit(lambda: store.select(filters)), rows, "rows")
+    store.store.close()
+
+
+BENCHMARKS = {
+    "get_data": bench_get_data,
+    "read_raw": bench_read_raw,
+    "read_scan": bench_read_scan,
+    "make": bench_make,
+    "parse_date": bench_parse_date,
+    "mca": bench_mca,
+    "csv_read": bench_csv_read,
+    "query": bench_query,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        with tempfile.TemporaryDirectory() as tmp:
+            BENCHMARKS[name](tmp)